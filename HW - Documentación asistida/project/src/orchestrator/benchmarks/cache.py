@@ -0,0 +1,66 @@
+"""Benchmark of RedisVectorCache.find_similar latency per storage mode.
+
+Seeds the same random chunks into a RedisJSON index and a FLOAT32 hash index
+under throwaway prefixes, then times KNN lookups with and without vectors.
+Needs a reachable redis-stack; run from src/orchestrator:
+
+    REDIS_HOST=cache python -m benchmarks.cache
+"""
+
+import asyncio
+import os
+import time
+import numpy as np
+from models.document import Document
+from retrieval.cache import RedisVectorCache, VECTOR_DIMENSION
+
+REDIS_HOST = os.environ.get("REDIS_HOST", "cache")
+REDIS_PORT = int(os.environ.get("REDIS_PORT", 6379))
+CHUNKS = 2_000
+QUERIES = 200
+K = 10
+
+
+def make_cache(storage: str) -> RedisVectorCache:
+    cache = RedisVectorCache(host=REDIS_HOST, port=REDIS_PORT, storage=storage)
+    cache.key_prefix = f"bench:{storage}:"
+    cache.index_name = f"idx:bench_{storage}"
+    cache.init_index(vector_dimension=VECTOR_DIMENSION)
+    return cache
+
+
+async def time_queries(cache, queries, with_vectors: bool) -> float:
+    start = time.perf_counter()
+    for vector in queries:
+        await cache.find_similar(vector, K, with_vectors=with_vectors)
+    return (time.perf_counter() - start) / len(queries)
+
+
+async def main():
+    rng = np.random.default_rng(0)
+    documents = [
+        Document(text=f"chunk {i} " * 40, url=f"https://example.com/{i}", vector=v)
+        for i, v in enumerate(rng.standard_normal((CHUNKS, VECTOR_DIMENSION)).tolist())
+    ]
+    queries = rng.standard_normal((QUERIES, VECTOR_DIMENSION)).tolist()
+
+    caches = [make_cache("json"), make_cache("hash")]
+    try:
+        for cache in caches:
+            await cache.write([doc.model_copy() for doc in documents])
+        time.sleep(1)  # let the indexer catch up
+
+        print(f"{'storage':>8} {'vectors':>8} {'ms/query':>10}")
+        for cache in caches:
+            for with_vectors in (True, False):
+                latency = await time_queries(cache, queries, with_vectors)
+                print(
+                    f"{cache.storage:>8} {str(with_vectors):>8} {latency * 1e3:>10.2f}"
+                )
+    finally:
+        for cache in caches:
+            cache.client.ft(cache.index_name).dropindex(delete_documents=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
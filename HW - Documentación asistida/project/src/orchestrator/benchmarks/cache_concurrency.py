@@ -0,0 +1,62 @@
+"""Concurrency benchmark of the sync and redis.asyncio chunk caches.
+
+Runs CONCURRENCY parallel find_similar lookups against RedisVectorCache and
+AsyncRedisVectorCache and reports throughput plus the worst event-loop stall
+seen by a 1 ms ticker, which is what other SSE streams would experience.
+Needs a reachable redis-stack with the chunk index; run from src/orchestrator:
+
+    REDIS_HOST=cache python -m benchmarks.cache_concurrency
+"""
+
+import asyncio
+import os
+import time
+import numpy as np
+from retrieval.cache import AsyncRedisVectorCache, RedisVectorCache, VECTOR_DIMENSION
+
+REDIS_HOST = os.environ.get("REDIS_HOST", "cache")
+REDIS_PORT = int(os.environ.get("REDIS_PORT", 6379))
+CONCURRENCY = int(os.environ.get("BENCH_CONCURRENCY", 32))
+ROUNDS = 20
+K = 10
+
+
+async def loop_lag(stop: asyncio.Event) -> float:
+    """Largest delay between consecutive 1 ms sleeps while the load runs."""
+
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        worst = max(worst, time.perf_counter() - start - 0.001)
+    return worst
+
+
+async def run(cache: RedisVectorCache, queries: np.ndarray) -> tuple[float, float]:
+    async def worker(i: int):
+        for r in range(ROUNDS):
+            await cache.find_similar(queries[(i + r) % len(queries)], K, False)
+
+    stop = asyncio.Event()
+    lag = asyncio.create_task(loop_lag(stop))
+    start = time.perf_counter()
+    await asyncio.gather(*[worker(i) for i in range(CONCURRENCY)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    return CONCURRENCY * ROUNDS / elapsed, await lag
+
+
+async def main():
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((CONCURRENCY, VECTOR_DIMENSION))
+
+    print(f"{'client':>8} {'queries/s':>10} {'max loop stall ms':>18}")
+    for name, cls in (("sync", RedisVectorCache), ("async", AsyncRedisVectorCache)):
+        cache = cls(host=REDIS_HOST, port=REDIS_PORT, storage="hash")
+        throughput, stall = await run(cache, queries)
+        print(f"{name:>8} {throughput:>10.1f} {stall * 1e3:>18.2f}")
+        await cache.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""Benchmark of AdjSenSplitter's clustering on long pages.
+
+Compares the original per-pair np.dot loop and list-of-lists clusters with
+the vectorized cluster_text / split_processed, on synthetic pages of 5k-50k
+sentences whose vectors drift like topics do, and checks the chunks match.
+Run from src/orchestrator:
+
+    python -m benchmarks.clustering
+"""
+
+import asyncio
+import time
+import numpy as np
+from retrieval.splitter import AdjSenSplitter
+
+DIMENSION = 96  # width of en_core_web_sm's tok2vec tensor
+SIZES = [5_000, 20_000, 50_000]
+REPEATS = 3
+
+
+def make_page(n: int, rng: np.random.Generator) -> tuple[list[str], np.ndarray]:
+    vecs = np.empty((n, DIMENSION), dtype=np.float32)
+    topic = rng.normal(size=DIMENSION)
+    for i in range(n):
+        if rng.random() < 0.05:
+            topic = rng.normal(size=DIMENSION)
+        vecs[i] = topic + rng.normal(scale=0.8, size=DIMENSION)
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+    sents = ["w" * int(length) + "." for length in rng.integers(10, 200, size=n)]
+    return sents, vecs
+
+
+async def legacy_split(sents, vecs, similarity_treshold: float = 0.6):
+    """AdjSenSplitter.split as it was, minus the spaCy parse."""
+
+    def cluster_text(sents, vecs, threshold):
+        clusters = [[0]]
+        for i in range(1, len(sents)):
+            if np.dot(vecs[i], vecs[i - 1]) < threshold:
+                clusters.append([])
+            clusters[-1].append(i)
+        return clusters
+
+    final_texts = []
+    for cluster in cluster_text(sents, vecs, 0.5):
+        cluster_txt = " ".join([sents[i] for i in cluster])
+        cluster_len = len(cluster_txt)
+        if cluster_len < 60:
+            continue
+        elif cluster_len > 3000:
+            sents_div = [sents[i] for i in cluster]
+            vecs_div = vecs[cluster]
+            for subcluster in cluster_text(sents_div, vecs_div, similarity_treshold):
+                div_txt = " ".join([sents_div[i] for i in subcluster])
+                if len(div_txt) < 60 or len(div_txt) > 3000:
+                    continue
+                final_texts.append(div_txt)
+        else:
+            final_texts.append(cluster_txt)
+    return final_texts
+
+
+def timed(fn, *args) -> tuple[float, list[str]]:
+    best, result = float("inf"), []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = asyncio.run(fn(*args))
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    rng = np.random.default_rng(0)
+    splitter = AdjSenSplitter()
+    print(
+        f"{'sentences':>10} {'legacy s':>10} {'vector s':>10} {'speedup':>8} {'same':>5}"
+    )
+    for n in SIZES:
+        sents, vecs = make_page(n, rng)
+        legacy, expected = timed(legacy_split, sents, vecs)
+        vectorized, chunks = timed(splitter.split_processed, sents, vecs, 0.6)
+        same = chunks == expected
+        print(
+            f"{n:>10} {legacy:>10.4f} {vectorized:>10.4f} "
+            f"{legacy / vectorized:>7.1f}x {same!s:>5}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Recall vs latency of HNSW index settings against the exact FLAT index.
+
+Seeds clustered random chunks under a throwaway prefix, builds one FLAT index
+as ground truth and one HNSW index per (M, EF_CONSTRUCTION) pair over the same
+keys, then sweeps EF_RUNTIME at query time. Needs a reachable redis-stack; run
+from src/orchestrator:
+
+    REDIS_HOST=cache python -m benchmarks.index
+"""
+
+import asyncio
+import os
+import time
+import numpy as np
+from retrieval.cache import RedisVectorCache, VECTOR_DIMENSION
+
+REDIS_HOST = os.environ.get("REDIS_HOST", "cache")
+REDIS_PORT = int(os.environ.get("REDIS_PORT", 6379))
+CHUNKS = int(os.environ.get("BENCH_CHUNKS", 20_000))
+QUERIES = 100
+CLUSTERS = 200
+K = 10
+BUILD_PARAMS = [(8, 100), (16, 200), (32, 200)]
+EF_RUNTIMES = [10, 50, 100, 200]
+PREFIX = "bench:index:"
+
+
+def make_cache(algorithm: str, index_params=None) -> RedisVectorCache:
+    cache = RedisVectorCache(
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        storage="hash",
+        algorithm=algorithm,
+        index_params=index_params,
+    )
+    cache.key_prefix = PREFIX
+    suffix = "_".join(str(v) for v in (index_params or {}).values())
+    cache.index_name = f"idx:bench_{algorithm.lower()}{suffix}"
+    return cache
+
+
+def seed(cache: RedisVectorCache, vectors: np.ndarray):
+    pipeline = cache.client.pipeline(transaction=False)
+    for i, vector in enumerate(vectors):
+        chunk = {"text": str(i), "url": "https://example.com", "vector": vector}
+        pipeline.hset(f"{PREFIX}{i}", mapping=cache.to_hash(chunk))
+        if i % 1000 == 999:
+            pipeline.execute()
+    pipeline.execute()
+
+
+def build(cache: RedisVectorCache) -> float:
+    start = time.perf_counter()
+    cache.init_index(vector_dimension=VECTOR_DIMENSION)
+    while float(cache.client.ft(cache.index_name).info()["percent_indexed"]) < 1:
+        time.sleep(0.1)
+    return time.perf_counter() - start
+
+
+async def run_queries(cache, queries) -> tuple[list[set[str]], float]:
+    results = []
+    start = time.perf_counter()
+    for vector in queries:
+        documents = await cache.find_similar(vector, K, with_vectors=False)
+        results.append({doc.text for doc in documents})
+    return results, (time.perf_counter() - start) / len(queries)
+
+
+async def main():
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((CLUSTERS, VECTOR_DIMENSION))
+    assignment = rng.integers(0, CLUSTERS, CHUNKS + QUERIES)
+    points = centers[assignment] + 0.5 * rng.standard_normal(
+        (CHUNKS + QUERIES, VECTOR_DIMENSION)
+    )
+    vectors, queries = points[:CHUNKS], points[CHUNKS:]
+
+    flat = make_cache("FLAT")
+    caches = [flat]
+    try:
+        seed(flat, vectors)
+        print(f"FLAT build {build(flat):.1f}s")
+        truth, flat_latency = await run_queries(flat, queries)
+        print(f"{'index':>22} {'ef_runtime':>10} {'recall@10':>10} {'ms/query':>10}")
+        print(f"{'FLAT':>22} {'-':>10} {1:>10.3f} {flat_latency * 1e3:>10.2f}")
+
+        for m, ef_construction in BUILD_PARAMS:
+            hnsw = make_cache("HNSW", {"M": m, "EF_CONSTRUCTION": ef_construction})
+            caches.append(hnsw)
+            build_time = build(hnsw)
+            name = f"HNSW M={m} EFC={ef_construction}"
+            print(f"{name} build {build_time:.1f}s")
+            for ef_runtime in EF_RUNTIMES:
+                hnsw.ef_runtime = ef_runtime
+                found, latency = await run_queries(hnsw, queries)
+                recall = np.mean([len(f & t) / K for f, t in zip(found, truth)])
+                print(
+                    f"{name:>22} {ef_runtime:>10} {recall:>10.3f} {latency * 1e3:>10.2f}"
+                )
+    finally:
+        for cache in caches[1:]:
+            cache.client.ft(cache.index_name).dropindex(delete_documents=False)
+        flat.client.ft(flat.index_name).dropindex(delete_documents=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,93 @@
+"""Benchmark of HTML text extraction on a saved corpus of real pages.
+
+Compares the original Scraper.parse (BeautifulSoup + html.parser) with
+retrieval.parser.extract_text on every installed backend, then parses the
+whole corpus concurrently through HtmlParser's process pool. Run from
+src/orchestrator; --fetch saves the pages linked in mocks/test_dict.py first:
+
+    python -m benchmarks.parsing --fetch
+    python -m benchmarks.parsing
+"""
+
+import argparse
+import asyncio
+import re
+import time
+from pathlib import Path
+import aiohttp
+from bs4 import BeautifulSoup
+from mocks.test_dict import provisional_search_result
+from retrieval.parser import HtmlParser, LexborHTMLParser, extract_text, lxml
+
+CORPUS = Path(__file__).parent / "html"
+
+
+def legacy_parse(body: str) -> str:
+    soup = BeautifulSoup(body, "html.parser")
+    raw_text = soup.get_text(separator=" ", strip=True)
+    return re.sub(r"\n{3,}|\s{2,}", "\n", raw_text)
+
+
+async def fetch_corpus():
+    CORPUS.mkdir(exist_ok=True)
+    timeout = aiohttp.ClientTimeout(total=10)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        for i, item in enumerate(provisional_search_result["items"]):
+            try:
+                async with session.get(item["link"]) as response:
+                    html = await response.text()
+            except Exception as e:
+                print(f"skip {item['link']}: {e!r}")
+                continue
+            (CORPUS / f"page_{i:02d}.html").write_text(html, encoding="utf-8")
+            print(f"saved {item['link']} ({len(html) / 1e6:.2f} MB)")
+
+
+def timed(fn, pages: list[str]) -> float:
+    start = time.perf_counter()
+    for page in pages:
+        fn(page)
+    return time.perf_counter() - start
+
+
+async def timed_pool(parser: HtmlParser, pages: list[str]) -> float:
+    await asyncio.gather(*[parser.parse(page) for page in pages[:2]])  # warm up
+    start = time.perf_counter()
+    await asyncio.gather(*[parser.parse(page) for page in pages])
+    return time.perf_counter() - start
+
+
+def main():
+    args = argparse.ArgumentParser()
+    args.add_argument("--fetch", action="store_true")
+    if args.parse_args().fetch:
+        asyncio.run(fetch_corpus())
+
+    pages = [path.read_text(encoding="utf-8") for path in sorted(CORPUS.glob("*.html"))]
+    if not pages:
+        raise SystemExit(f"No pages in {CORPUS}, run with --fetch first.")
+    megabytes = sum(len(page) for page in pages) / 1e6
+    print(f"{len(pages)} pages, {megabytes:.2f} MB")
+
+    backends = ["html.parser"]
+    if lxml is not None:
+        backends.append("lxml")
+    if LexborHTMLParser is not None:
+        backends.append("selectolax")
+
+    print(f"{'parser':>24} {'seconds':>9} {'MB/s':>8}")
+    runs = [("legacy bs4", lambda page: legacy_parse(page))]
+    runs += [(b, lambda page, b=b: extract_text(page, b)) for b in backends]
+    for name, fn in runs:
+        elapsed = timed(fn, pages)
+        print(f"{name:>24} {elapsed:>9.3f} {megabytes / elapsed:>8.1f}")
+
+    parser = HtmlParser(inline_below=0)
+    elapsed = asyncio.run(timed_pool(parser, pages))
+    parser.close()
+    name = f"pool {parser.backend}"
+    print(f"{name:>24} {elapsed:>9.3f} {megabytes / elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
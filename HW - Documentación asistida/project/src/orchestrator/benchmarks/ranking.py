@@ -0,0 +1,82 @@
+"""Microbenchmark of Retriever.get_most_similar ranking paths.
+
+Compares the previous pandas/sklearn row-by-row path against retrieval.ranking.Ranker.
+Run from src/orchestrator (e.g. inside the orchestrator container):
+
+    python -m benchmarks.ranking
+"""
+
+import time
+from typing import Any
+import numpy as np
+import pandas as pd
+from sklearn.metrics.pairwise import cosine_similarity
+from models.document import Document
+from retrieval.ranking import Ranker
+
+DIMENSION = 1536
+K = 10
+SIZES = [100, 1_000, 10_000]
+
+
+def legacy_most_similar(query_vector, data, k) -> list[Document]:
+    query_vector = np.array(query_vector).reshape(1, -1)
+
+    def compute_cosine_similarity(row):
+        return cosine_similarity(query_vector, row)[0][0]
+
+    df: Any = pd.DataFrame(data)
+    df["vector"] = df["vector"].apply(lambda x: np.array(x).reshape(1, -1))
+    df["similarity"] = df["vector"].apply(compute_cosine_similarity)
+    similar = df.nlargest(k, "similarity")[["text", "url", "vector", "similarity"]]
+    similar["vector"] = similar["vector"].apply(lambda x: x[0].tolist())
+
+    json_docs = similar.to_dict("records")
+
+    return [Document(**json_doc) for json_doc in json_docs]
+
+
+def ranker_most_similar(query_vector, data, k) -> list[Document]:
+    ranker = Ranker(query_vector)
+    ranker.add(data)
+    return ranker.top_k(k)
+
+
+def make_data(size: int, rng: np.random.Generator) -> tuple[list[float], list[dict]]:
+    vectors = rng.standard_normal((size, DIMENSION)).tolist()
+    data = [
+        {"text": f"chunk {i}", "url": f"https://example.com/{i % 10}", "vector": v}
+        for i, v in enumerate(vectors)
+    ]
+    return rng.standard_normal(DIMENSION).tolist(), data
+
+
+def best_of(fn, *args, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"{'chunks':>8} {'legacy ms':>12} {'ranker ms':>12} {'speedup':>9}")
+    for size in SIZES:
+        query_vector, data = make_data(size, rng)
+        repeat = 3 if size >= 10_000 else 10
+
+        legacy_docs = legacy_most_similar(query_vector, data, K)
+        ranker_docs = ranker_most_similar(query_vector, data, K)
+        assert [d.text for d in legacy_docs] == [d.text for d in ranker_docs]
+
+        legacy = best_of(legacy_most_similar, query_vector, data, K, repeat=repeat)
+        ranker = best_of(ranker_most_similar, query_vector, data, K, repeat=repeat)
+        print(
+            f"{size:>8} {legacy * 1e3:>12.2f} {ranker * 1e3:>12.2f} {legacy / ranker:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Throughput benchmark of LangChainSplitter at the production 400/50 setting.
+
+Compares the original per-call RecursiveCharacterTextSplitter with the native
+split_text engine, inline and through split_many's process pool, and checks
+that every engine returns identical chunks. Uses the text of the pages saved
+by benchmarks.parsing when present, otherwise generated prose. Run from
+src/orchestrator:
+
+    python -m benchmarks.splitting
+"""
+
+import asyncio
+import random
+import time
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from benchmarks.parsing import CORPUS
+from retrieval.parser import available_backend, extract_text
+from retrieval.splitter import LangChainSplitter
+
+CHUNK_SIZE = 400
+CHUNK_OVERLAP = 50
+REPEATS = 3
+
+
+def load_texts() -> list[str]:
+    backend = available_backend()
+    texts = [
+        extract_text(path.read_text(encoding="utf-8"), backend)
+        for path in sorted(CORPUS.glob("*.html"))
+    ]
+    if texts:
+        return texts
+
+    random.seed(0)
+    words = ["retrieval", "of", "the", "context", "a", "model", "answer", "page"]
+    words += ["https://example.com/" + "x" * 300, "query", "and", "embedding"]
+    texts = []
+    for _ in range(40):
+        paragraphs = []
+        for _ in range(random.randint(20, 120)):
+            lines = [
+                " ".join(random.choices(words, k=random.randint(3, 60)))
+                for _ in range(random.randint(1, 6))
+            ]
+            paragraphs.append("\n".join(lines))
+        texts.append("\n\n".join(paragraphs))
+    return texts
+
+
+def legacy_split(text: str) -> list[str]:
+    return RecursiveCharacterTextSplitter(
+        separators=["\n\n", "\n", " ", ""],
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        length_function=len,
+    ).split_text(text)
+
+
+def timed(fn, texts: list[str]) -> tuple[float, list[list[str]]]:
+    best, result = float("inf"), []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = fn(texts)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    texts = load_texts()
+    megabytes = sum(len(text) for text in texts) / 1e6
+    print(f"{len(texts)} texts, {megabytes:.2f} MB")
+
+    native = LangChainSplitter(CHUNK_SIZE, CHUNK_OVERLAP, len, inline_below=0)
+    cached = LangChainSplitter(CHUNK_SIZE, CHUNK_OVERLAP, lambda text: len(text))
+
+    async def pooled(texts):
+        return await native.split_many(texts)
+
+    asyncio.run(pooled(texts[:2]))  # start the workers
+    runs = [
+        ("legacy per call", lambda texts: [legacy_split(text) for text in texts]),
+        ("langchain cached", lambda texts: [cached.split_text(t) for t in texts]),
+        ("native", lambda texts: [native.split_text(text) for text in texts]),
+        ("native pool", lambda texts: asyncio.run(pooled(texts))),
+    ]
+
+    print(f"{'splitter':>18} {'seconds':>9} {'MB/s':>8} {'chunks':>8} {'same':>5}")
+    reference = None
+    for name, fn in runs:
+        elapsed, chunks = timed(fn, texts)
+        reference = reference or chunks
+        count = sum(len(c) for c in chunks)
+        same = chunks == reference
+        print(
+            f"{name:>18} {elapsed:>9.3f} {megabytes / elapsed:>8.1f} {count:>8} {same!s:>5}"
+        )
+    native.close()
+
+
+if __name__ == "__main__":
+    main()
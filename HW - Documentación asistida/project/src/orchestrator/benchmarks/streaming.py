@@ -0,0 +1,77 @@
+"""Load test: do concurrent /streamingSearch streams run in parallel?
+
+Opens one stream alone, then CONCURRENCY streams at once, and reports wall
+time plus per-stream time to first token. If streams serialized on the event
+loop, the concurrent wall time would approach CONCURRENCY x the single one.
+Every stream asks a different question, so none is coalesced with another or
+served from the query cache; set BENCH_QUERIES to newline-separated questions
+not asked since the cache's ttl when rerunning.
+Needs a running orchestrator; run from src/orchestrator:
+
+    ORCHESTRATOR_URL=http://localhost:8000 python -m benchmarks.streaming
+"""
+
+import asyncio
+import os
+import statistics
+import time
+import aiohttp
+
+ORCHESTRATOR_URL = os.environ.get("ORCHESTRATOR_URL", "http://localhost:8000")
+CONCURRENCY = int(os.environ.get("BENCH_CONCURRENCY", 8))
+QUERIES = os.environ.get(
+    "BENCH_QUERIES",
+    "What is retrieval augmented generation\n"
+    "How do vector databases index embeddings\n"
+    "Why did the Roman Empire split in two\n"
+    "How does photosynthesis store energy\n"
+    "What causes the northern lights\n"
+    "How do vaccines train the immune system\n"
+    "Who designed the first mechanical computer\n"
+    "Why is the sky blue during the day\n"
+    "How do bees communicate the location of flowers",
+).splitlines()
+
+
+async def consume(session: aiohttp.ClientSession, query: str) -> tuple[float, float]:
+    """Reads one SSE stream to the end; returns (first token, total) seconds."""
+
+    start = time.perf_counter()
+    first_token = None
+    url = f"{ORCHESTRATOR_URL}/streamingSearch"
+    async with session.get(url, params={"query": query}) as response:
+        async for line in response.content:
+            if first_token is None and line.startswith(b"event: token"):
+                first_token = time.perf_counter() - start
+    total = time.perf_counter() - start
+    return first_token or total, total
+
+
+async def run(session, queries: list[str]) -> tuple[float, list[float]]:
+    start = time.perf_counter()
+    results = await asyncio.gather(*[consume(session, query) for query in queries])
+    return time.perf_counter() - start, [first for first, _ in results]
+
+
+async def main():
+    if len(QUERIES) < CONCURRENCY + 1:
+        raise SystemExit(f"BENCH_QUERIES needs {CONCURRENCY + 1} distinct questions")
+
+    timeout = aiohttp.ClientTimeout(total=None)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        single_wall, single_first = await run(session, QUERIES[:1])
+        wall, first = await run(session, QUERIES[1 : CONCURRENCY + 1])
+
+    print(f"1 stream:  wall {single_wall:.2f}s, first token {single_first[0]:.2f}s")
+    print(
+        f"{CONCURRENCY} streams: wall {wall:.2f}s, first token "
+        f"p50 {statistics.median(first):.2f}s max {max(first):.2f}s"
+    )
+    print(
+        f"wall ratio {wall / single_wall:.2f} "
+        f"(serialized streams would be ~{CONCURRENCY})"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
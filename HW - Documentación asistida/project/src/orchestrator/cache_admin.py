@@ -0,0 +1,63 @@
+"""Maintenance commands for the redis chunk cache.
+
+python cache_admin.py migrate
+python cache_admin.py rebuild --algorithm HNSW --m 16 --ef-construction 200
+
+Index settings default to the CACHE_INDEX_* variables the server reads; set
+them to the same values after a rebuild so restarts keep querying it alike.
+"""
+
+import argparse
+import logging
+from retrieval.cache import (
+    INDEX_PARAMS,
+    VECTOR_DIMENSION,
+    RedisVectorCache,
+    index_settings,
+)
+
+
+def main():
+    settings = index_settings()
+    defaults = settings["index_params"]
+    parser = argparse.ArgumentParser(description="Chunk cache maintenance.")
+    parser.add_argument("command", choices=["migrate", "rebuild"])
+    parser.add_argument("--host", default="cache")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument(
+        "--algorithm", choices=list(INDEX_PARAMS), default=settings["algorithm"]
+    )
+    parser.add_argument("--m", type=int, default=defaults.get("M"))
+    parser.add_argument(
+        "--ef-construction", type=int, default=defaults.get("EF_CONSTRUCTION")
+    )
+    parser.add_argument("--ef-runtime", type=int, default=defaults.get("EF_RUNTIME"))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    index_params = {
+        name: value
+        for name, value in (
+            ("M", args.m),
+            ("EF_CONSTRUCTION", args.ef_construction),
+            ("EF_RUNTIME", args.ef_runtime),
+        )
+        if value is not None
+    }
+    cache = RedisVectorCache(
+        host=args.host,
+        port=args.port,
+        storage="hash",
+        algorithm=args.algorithm,
+        index_params=index_params,
+    )
+
+    if args.command == "migrate":
+        cache.init_index(vector_dimension=VECTOR_DIMENSION)
+        cache.migrate_json_to_hash()
+    else:
+        cache.rebuild_index(vector_dimension=VECTOR_DIMENSION)
+
+
+if __name__ == "__main__":
+    main()
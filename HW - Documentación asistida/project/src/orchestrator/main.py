@@ -1,76 +1,236 @@
-from typing import AsyncGenerator
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import json
+import time
+from typing import AsyncGenerator, AsyncIterator, Optional
+import aiohttp
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from sse_starlette.sse import EventSourceResponse
 from util import logger
+from util.http import create_session
+from util.singleflight import SingleFlight
+from util import metrics
 
 import prompt
 import openai
+from openai import api_requestor
 from retrieval import Retriever
 from retrieval.search import GoogleAPI
-from retrieval.cache import RedisVectorCache
+from retrieval.cache import AsyncRedisVectorCache, index_settings
 from retrieval.scraper import ScraperLocal, ScraperRemote
-from retrieval.embeddings import OpenAIEmbeddings, RemoteEmbeddings
+from retrieval.parser import HtmlParser
+from retrieval.page_cache import CachedScraper, RedisPageStore
+from retrieval.scheduler import ScheduledScraper
+from retrieval.query_cache import QueryCache
+from retrieval.context import ContextBuilder, token_counter
+from retrieval.embeddings import (
+    BatchedEmbeddings,
+    CachedEmbeddings,
+    OpenAIEmbeddings,
+    RemoteEmbeddings,
+)
 from retrieval.splitter import LangChainSplitter
 
-
 # # setup loggers
 # logging.config.fileConfig("logging.conf", disable_existing_loggers=False)  # type: ignore
 # logger = logging.getLogger(__name__)
-app = FastAPI()
-
 
-def stream_chat(prompt: str):
-    for chunk in openai.ChatCompletion.create(
-        model="gpt-3.5-turbo",
-        temperature=0.0,
-        messages=[{"role": "user", "content": prompt}],
-        stream=True,
-    ):
-        content = chunk["choices"][0].get("delta", {}).get("content")  # type: ignore
-        if content is not None:
-            yield content
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Builds the clients shared by every request and tears them down on exit."""
 
-async def event_generator(query) -> AsyncGenerator[dict, None]:
-    redis = RedisVectorCache(host="cache", port=6379)
-    embeddings = OpenAIEmbeddings()
-    google = GoogleAPI()
-    scraper = ScraperLocal()
+    session = create_session()
+    redis = AsyncRedisVectorCache(
+        host="cache", port=6379, storage="hash", **index_settings()
+    )
+    embeddings = CachedEmbeddings(
+        BatchedEmbeddings(OpenAIEmbeddings(session=session)), client=redis.aclient
+    )
+    google = GoogleAPI(session=session)
+    parser = HtmlParser()
+    scraper = CachedScraper(
+        ScheduledScraper(ScraperLocal(session=session, parser=parser)),
+        store=RedisPageStore(redis.aclient),
+    )
     splitter = LangChainSplitter(chunk_size=400, chunk_overlap=50, length_function=len)
 
-    # scraper = ScraperRemoteClient()
-    # embeddings = RemoteEmbeddings()
+    # scraper = ScraperRemote(session=session, parser=parser, output="text")
+    # embeddings = RemoteEmbeddings(session=session)
 
     # redis.init_test()
-    try:
-        redis.init_index(vector_dimension=embeddings.vector_dimension)
+    if redis.init_index(vector_dimension=embeddings.vector_dimension):
         logger.info(
             f"Created index with vector dimensions {embeddings.vector_dimension}"
         )
-    except:
-        logger.info("Index already exists.")
-
-    retriever = Retriever(
+    query_cache = QueryCache(redis.aclient)
+    await query_cache.init_index(vector_dimension=embeddings.vector_dimension)
+
+    metrics.register_stats("embedding_cache", embeddings.stats)
+    metrics.register_stats("query_cache", query_cache.stats)
+    metrics.register_stats("page_cache", scraper.stats)
+    metrics.register_stats("scheduler", scraper.scraper.stats)  # type: ignore
+
+    app.state.session = session
+    app.state.query_cache = query_cache
+    app.state.flights = SingleFlight()
+    app.state.retriever = Retriever(
         cache=redis,
         searcher=google,
         scraper=scraper,
         embeddings=embeddings,
         splitter=splitter,
+        pipelined=True,
+        deadline=10.0,
+        early_exit=0.85,
+        context_builder=ContextBuilder(max_tokens=2000),
+    )
+    try:
+        yield
+    finally:
+        await session.close()
+        await redis.aclose()
+        parser.close()
+        splitter.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+async def stream_chat(
+    prompt: str, session: Optional[aiohttp.ClientSession] = None
+) -> AsyncGenerator[str, None]:
+    """Streams completion tokens without blocking the event loop.
+
+    Tokens are pulled from upstream only as fast as the SSE client consumes
+    them, and closing this generator (e.g. on client disconnect) closes the
+    upstream response, which stops generation. The request goes through
+    APIRequestor because ChatCompletion.acreate wraps its stream in a generator
+    whose aclose() leaves the aiohttp response open until garbage collection.
+    """
+
+    if session is not None:
+        openai.aiosession.set(session)
+    model = "gpt-3.5-turbo"
+    start = time.perf_counter()
+    first_token, rest = None, []
+    response, _, _ = await api_requestor.APIRequestor().arequest(
+        "post",
+        openai.ChatCompletion.class_url(),
+        params={
+            "model": model,
+            "temperature": 0.0,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": True,
+        },
+        stream=True,
     )
-    async for event in retriever.get_context(query=query, cache_treshold=0.85, k=10):
+    try:
+        async for chunk in response:  # type: ignore
+            content = chunk.data["choices"][0].get("delta", {}).get("content")
+            if content is not None:
+                if first_token is None:
+                    first_token = time.perf_counter()
+                    metrics.observe("llm_first_token", first_token - start)
+                else:
+                    rest.append(content)
+                yield content
+    finally:
+        await response.aclose()  # type: ignore
+        end = time.perf_counter()
+        metrics.observe("llm", end - start)
+        if first_token is not None and rest and end > first_token:
+            # Delta chunks are not always one token each, so count them.
+            tokens = token_counter(model)("".join(rest))
+            metrics.LLM_TOKENS_PER_SECOND.observe(model, tokens / (end - first_token))
+
+
+async def event_generator(
+    query,
+    retriever: Retriever,
+    session: Optional[aiohttp.ClientSession] = None,
+    query_cache: Optional[QueryCache] = None,
+) -> AsyncGenerator[dict, None]:
+    """Streams search, context, prompt and token events for a query.
+
+    A near-duplicate of a recently answered query reuses its context from the
+    query cache, and its answer too when the match is close enough; otherwise
+    the completed answer is stored there. The query embedding
+    is computed twice on a miss, but the second run is an embedding cache hit.
+    The stream ends with a timings event summarizing the request's stages.
+    """
+
+    trace = metrics.start_trace()
+    vector, cached = None, None
+    if query_cache is not None:
+        with metrics.span("query_cache"):
+            vector = (await retriever.embeddings.run([query]))[0]
+            cached = await query_cache.lookup(vector)
+
+    if cached is not None:
+        events = query_cache.events(cached)  # type: ignore
+    else:
+        events = retriever.get_context(query=query, cache_treshold=0.85, k=10)
+
+    search = ""
+    async for event in events:
         yield event
+        if event["event"] == "search":
+            search = event["data"]
         if event["event"] == "context":
             final_prompt = prompt.rag.format(context=event["data"], question=query)
 
             yield {"event": "prompt", "data": final_prompt}
 
-            for text in stream_chat(prompt=final_prompt):
-                yield {"event": "token", "data": text}
+            if cached is not None and cached.answer is not None:
+                yield {"event": "token", "data": cached.answer}
+                continue
+
+            answer = []
+            tokens = stream_chat(prompt=final_prompt, session=session)
+            try:
+                async for text in tokens:
+                    answer.append(text)
+                    yield {"event": "token", "data": text}
+            finally:
+                await tokens.aclose()
+
+            if query_cache is not None and cached is None and event["data"]:
+                await query_cache.store(
+                    query, vector, search, event["data"], "".join(answer)  # type: ignore
+                )
+
+    summary = trace.summary()
+    metrics.observe("request", summary["total"])
+    yield {"event": "timings", "data": json.dumps(summary)}
+
+
+async def without_timings(events: AsyncIterator[dict]) -> AsyncGenerator[dict, None]:
+    try:
+        async for event in events:
+            if event["event"] != "timings":
+                yield event
+    finally:
+        await events.aclose()  # type: ignore
 
 
 @app.get("/streamingSearch")
-async def main(query: str) -> EventSourceResponse:
-    return EventSourceResponse(event_generator(query))
+async def main(
+    query: str, request: Request, timings: bool = False
+) -> EventSourceResponse:
+    state = request.app.state
+    events = state.flights.stream(
+        " ".join(query.lower().split()),
+        lambda: event_generator(
+            query, state.retriever, state.session, state.query_cache
+        ),
+    )
+    return EventSourceResponse(events if timings else without_timings(events))
+
+
+@app.get("/metrics")
+async def prometheus_metrics() -> PlainTextResponse:
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 if __name__ == "__main__":
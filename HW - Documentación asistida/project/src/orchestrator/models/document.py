@@ -5,5 +5,5 @@ from typing import Optional
 class Document(BaseModel):
     text: str
     url: str
-    vector: list[float]
+    vector: Optional[list[float]] = None
     similarity: float
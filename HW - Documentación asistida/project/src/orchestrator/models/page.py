@@ -0,0 +1,11 @@
+from typing import Optional
+from pydantic import BaseModel
+
+
+class CachedPage(BaseModel):
+    url: str
+    text: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: float
+    max_age: float
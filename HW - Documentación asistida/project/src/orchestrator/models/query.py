@@ -0,0 +1,10 @@
+from typing import Optional
+from pydantic import BaseModel
+
+
+class CachedQuery(BaseModel):
+    query: str
+    search: str
+    context: str
+    answer: Optional[str] = None
+    similarity: float
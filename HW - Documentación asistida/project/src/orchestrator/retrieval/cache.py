@@ -1,9 +1,14 @@
 from abc import ABC, abstractmethod
 import hashlib
+from itertools import chain
 import json
+import os
+import time
+from typing import Optional
 import numpy as np
 import pandas as pd
 import redis
+import redis.asyncio as aioredis
 from redis.commands.search.field import (
     TextField,
     VectorField,
@@ -11,13 +16,44 @@ from redis.commands.search.field import (
 from redis.commands.search.indexDefinition import IndexDefinition, IndexType
 from redis.commands.search.query import Query
 from models.document import Document
+from util import logger
 
 VECTOR_DIMENSION = 1536
+KEY_PREFIX = "chunks:"
+JSON_INDEX = "idx:chunks_vss"
+HASH_INDEX = "idx:chunks_bin"
+INDEX_PARAMS = {
+    "FLAT": ("INITIAL_CAP", "BLOCK_SIZE"),
+    "HNSW": ("INITIAL_CAP", "M", "EF_CONSTRUCTION", "EF_RUNTIME", "EPSILON"),
+}
+
+
+def index_settings() -> dict:
+    """Vector index settings from the environment, so the server and
+    cache_admin.py build and query the index an operator chose.
+
+    CACHE_INDEX_ALGORITHM is FLAT or HNSW; CACHE_INDEX_M,
+    CACHE_INDEX_EF_CONSTRUCTION and CACHE_INDEX_EF_RUNTIME set HNSW params,
+    and the last one is also applied per query.
+    """
+
+    index_params = {}
+    for name in ("M", "EF_CONSTRUCTION", "EF_RUNTIME"):
+        value = os.environ.get(f"CACHE_INDEX_{name}")
+        if value:
+            index_params[name] = int(value)
+    return {
+        "algorithm": os.environ.get("CACHE_INDEX_ALGORITHM", "FLAT").upper(),
+        "index_params": index_params,
+        "ef_runtime": index_params.get("EF_RUNTIME"),
+    }
 
 
 class VectorDbCache(ABC):
     @abstractmethod
-    async def find_similar(self, vector: list[float], k=10) -> list[Document]:
+    async def find_similar(
+        self, vector: list[float], k=10, with_vectors: bool = True
+    ) -> list[Document]:
         pass
 
     @abstractmethod
@@ -29,62 +65,245 @@ SHA256 = hashlib.sha256()
 
 
 class RedisVectorCache(VectorDbCache):
+    """Chunk cache on redis-stack.
+
+    With storage="json" chunks are RedisJSON documents indexed by idx:chunks_vss.
+    With storage="hash" chunks are hashes whose vector is a packed FLOAT32 blob,
+    indexed by idx:chunks_bin, so hits are decoded with np.frombuffer instead of
+    json.loads.
+
+    The vector index is FLAT (exact, brute force) by default; algorithm="HNSW"
+    with index_params such as M / EF_CONSTRUCTION / EF_RUNTIME builds an
+    approximate graph index instead, and ef_runtime overrides EF_RUNTIME per
+    query.
+    """
+
     _pool = None
+    key_prefix = KEY_PREFIX
+    dedup_threshold = 0.97
+
+    def __init__(
+        self,
+        host,
+        port,
+        bulk_dedup: bool = True,
+        storage: str = "json",
+        algorithm: str = "FLAT",
+        index_params: Optional[dict] = None,
+        ef_runtime: Optional[int] = None,
+    ) -> None:
+        if storage not in ("json", "hash"):
+            raise ValueError(f"Unknown storage {storage!r}, use 'json' or 'hash'.")
+        if algorithm not in INDEX_PARAMS:
+            raise ValueError(f"Unknown algorithm {algorithm!r}, use 'FLAT' or 'HNSW'.")
+        unknown = set(index_params or {}) - set(INDEX_PARAMS[algorithm])
+        if unknown:
+            raise ValueError(f"Unsupported {algorithm} index params: {unknown}")
 
-    def __init__(self, host, port) -> None:
         if RedisVectorCache._pool is None:
             RedisVectorCache._pool = redis.ConnectionPool(host=host, port=port)
 
         self.client = redis.Redis(
             connection_pool=RedisVectorCache._pool, decode_responses=True
         )
+        self.bulk_dedup = bulk_dedup
+        self.storage = storage
+        self.index_name = HASH_INDEX if storage == "hash" else JSON_INDEX
+        self.algorithm = algorithm
+        self.index_params = index_params or {}
+        self.ef_runtime = ef_runtime
 
-    async def find_similar(self, vector: list[float], k=10) -> list[Document]:
-        chunks = (
-            self.client.ft("idx:chunks_vss")
-            .search(
-                Query(f"(*)=>[KNN {k} @vector $query_vector AS vector_score]")
-                .sort_by("vector_score")
-                .return_fields("vector_score", "text", "url", "vector")
-                .dialect(2),
-                {"query_vector": np.array(vector, dtype=np.float32).tobytes()},
-            )
-            .docs  # type: ignore
-        )
-        documents = map(
-            lambda doc: Document(
-                url=doc.url,
-                text=doc.text,
-                vector=json.loads(doc.vector),
-                similarity=1 - float(doc.vector_score),
-            ),
-            chunks,
+    def close(self):
+        if RedisVectorCache._pool is not None:
+            RedisVectorCache._pool.disconnect()
+            RedisVectorCache._pool = None
+
+    async def aclose(self):
+        self.close()
+
+    def knn_query(self, k: int, *fields: str) -> Query:
+        ef_runtime = ""
+        if self.algorithm == "HNSW" and self.ef_runtime:
+            ef_runtime = f" EF_RUNTIME {self.ef_runtime}"
+        return (
+            Query(f"(*)=>[KNN {k} @vector $query_vector{ef_runtime} AS vector_score]")
+            .sort_by("vector_score")
+            .return_fields("vector_score", *fields)
+            .dialect(2)
         )
 
-        return list(documents)
+    def search_args(self, query: Query, vector) -> list:
+        blob = np.asarray(vector, dtype=np.float32).tobytes()
+        return [
+            self.index_name,
+            *query.get_args(),
+            "PARAMS",
+            2,
+            "query_vector",
+            blob,
+        ]
+
+    def parse_hits(self, response) -> list[Document]:
+        """Builds Documents from a raw FT.SEARCH response.
+
+        The response is parsed by hand because redis-py's Result utf-8 decodes
+        every field, which would corrupt FLOAT32 vector blobs.
+        """
+
+        documents = []
+        for fields in response[2::2]:
+            hit = dict(zip(fields[::2], fields[1::2]))
+            documents.append(
+                Document(
+                    url=hit[b"url"].decode("utf-8") if b"url" in hit else "",
+                    text=hit[b"text"].decode("utf-8") if b"text" in hit else "",
+                    vector=self.decode_vector(hit.get(b"vector")),
+                    similarity=1 - float(hit[b"vector_score"]),
+                )
+            )
+        return documents
+
+    def decode_vector(self, value: Optional[bytes]) -> Optional[list[float]]:
+        if value is None:
+            return None
+        if self.storage == "hash":
+            return np.frombuffer(value, dtype=np.float32).tolist()
+        return json.loads(value)
+
+    async def run_pipeline(self, commands: list[tuple], transaction=False) -> list:
+        pipeline = self.client.pipeline(transaction=transaction)
+        for command in commands:
+            pipeline.execute_command(*command)
+        return pipeline.execute()
+
+    async def find_similar(
+        self, vector: list[float], k=10, with_vectors: bool = True
+    ) -> list[Document]:
+        fields = ("text", "url", "vector") if with_vectors else ("text", "url")
+        query = self.knn_query(k, *fields)
+        response = self.client.execute_command(
+            "FT.SEARCH", *self.search_args(query, vector)
+        )
+        return self.parse_hits(response)
 
     async def get_insertables(self, documents: list[Document]) -> list[Document]:
+        if self.bulk_dedup:
+            return await self.get_insertables_bulk(documents)
+
         insertables = []
         for document in documents:
-            results = await self.find_similar(document.vector, k=1)
+            results = await self.find_similar(document.vector, k=1, with_vectors=False)
             if not results:
                 insertables.append(document)
-            elif results[0].similarity < 0.97:
+            elif results[0].similarity < self.dedup_threshold:
                 insertables.append(document)
         return insertables
 
+    async def get_insertables_bulk(self, documents: list[Document]) -> list[Document]:
+        """Dedups the batch in memory, then probes the survivors in one pipeline."""
+
+        if not documents:
+            return []
+
+        vectors = np.array([doc.vector for doc in documents], dtype=np.float32)
+        survivors = self.dedup_batch(vectors)
+
+        query = self.knn_query(1)
+        responses = await self.run_pipeline(
+            [("FT.SEARCH", *self.search_args(query, vectors[i])) for i in survivors]
+        )
+
+        insertables = []
+        for i, response in zip(survivors, responses):
+            hits = self.parse_hits(response)
+            if not hits or hits[0].similarity < self.dedup_threshold:
+                insertables.append(documents[i])
+
+        logger.info(
+            f"CACHE DEDUP: {len(documents)} documents, {len(survivors)} probes, "
+            f"{len(documents) - len(survivors)} probes saved, "
+            f"{len(insertables)} insertables"
+        )
+        return insertables
+
+    def dedup_batch(self, vectors: np.ndarray) -> list[int]:
+        """Indices of vectors that are not near-duplicates of an earlier one."""
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        unit = np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+        similarities = unit @ unit.T
+
+        kept: list[int] = []
+        for i in range(len(unit)):
+            if not kept or similarities[i, kept].max() < self.dedup_threshold:
+                kept.append(i)
+        return kept
+
     async def write(self, documents: list[Document]):
         documents = await self.get_insertables(documents)
-        pipeline = self.client.pipeline()
+        commands: list[tuple] = []
         for document in documents:
             SHA256.update(document.text.encode("utf-8"))
             chunk_id = SHA256.hexdigest()
-            redis_key = f"chunks:{chunk_id}"
-            document.similarity = -1
-            pipeline.json().set(redis_key, "$", document.model_dump())
-            pipeline.expire(redis_key, 3600)
+            redis_key = f"{self.key_prefix}{chunk_id}"
+            if self.storage == "hash":
+                mapping = self.to_hash(document.model_dump())
+                commands.append(
+                    ("HSET", redis_key, *chain.from_iterable(mapping.items()))
+                )
+            else:
+                document.similarity = -1
+                chunk = json.dumps(document.model_dump())
+                commands.append(("JSON.SET", redis_key, "$", chunk))
+            commands.append(("EXPIRE", redis_key, 3600))
 
-        pipeline.execute()
+        await self.run_pipeline(commands, transaction=True)
+
+    def to_hash(self, chunk: dict) -> dict:
+        return {
+            "text": chunk["text"],
+            "url": chunk["url"],
+            "vector": np.array(chunk["vector"], dtype=np.float32).tobytes(),
+        }
+
+    def migrate_json_to_hash(self, batch_size: int = 500) -> int:
+        """Rewrites RedisJSON chunks as FLOAT32 hashes in place, keeping their TTL."""
+
+        migrated = 0
+        keys = self.client.scan_iter(
+            match=f"{self.key_prefix}*", count=batch_size, _type="ReJSON-RL"
+        )
+        batch: list[bytes] = []
+        for key in keys:
+            batch.append(key)
+            if len(batch) == batch_size:
+                migrated += self._migrate_batch(batch)
+                batch = []
+        if batch:
+            migrated += self._migrate_batch(batch)
+
+        logger.info(f"Migrated {migrated} chunks to hash storage.")
+        return migrated
+
+    def _migrate_batch(self, keys: list[bytes]) -> int:
+        read = self.client.pipeline(transaction=False)
+        for key in keys:
+            read.json().get(key)
+            read.pttl(key)
+        values = read.execute()
+
+        write = self.client.pipeline(transaction=False)
+        migrated = 0
+        for key, chunk, ttl in zip(keys, values[::2], values[1::2]):
+            if not chunk:
+                continue
+            write.delete(key)
+            write.hset(key, mapping=self.to_hash(chunk))
+            if ttl > 0:
+                write.pexpire(key, ttl)
+            migrated += 1
+        write.execute()
+        return migrated
 
     def init_test(self):
         df = pd.read_pickle("mocks/database_pickle")
@@ -99,22 +318,112 @@ class RedisVectorCache(VectorDbCache):
             pipeline.json().set(redis_key, "$", chunk)
         pipeline.execute()
 
-    def init_index(self, vector_dimension):
+    def init_index(self, vector_dimension, index_name: Optional[str] = None) -> bool:
+        """Creates the vector index unless the name already resolves to one.
+
+        FT.INFO resolves aliases, so once rebuild_index has swapped in another
+        index the alias is left alone rather than shadowed. Returns whether an
+        index was created.
+        """
+
+        name = index_name or self.index_name
+        try:
+            self.client.ft(name).info()
+        except redis.ResponseError:
+            pass
+        else:
+            logger.info(f"Index {name} already exists.")
+            return False
+
+        path = "" if self.storage == "hash" else "$."
         schema = (
-            TextField("$.text", no_stem=True, as_name="text"),
-            TextField("$.url", no_stem=True, as_name="url"),
+            TextField(f"{path}text", no_stem=True, as_name="text"),
+            TextField(f"{path}url", no_stem=True, as_name="url"),
             VectorField(
-                "$.vector",
-                "FLAT",
+                f"{path}vector",
+                self.algorithm,
                 {
                     "TYPE": "FLOAT32",
                     "DIM": vector_dimension,
                     "DISTANCE_METRIC": "COSINE",
+                    **self.index_params,
                 },
                 as_name="vector",
             ),
         )
-        definition = IndexDefinition(prefix=["chunks:"], index_type=IndexType.JSON)
-        self.client.ft("idx:chunks_vss").create_index(
-            fields=schema, definition=definition
+        index_type = IndexType.HASH if self.storage == "hash" else IndexType.JSON
+        definition = IndexDefinition(prefix=[self.key_prefix], index_type=index_type)
+        self.client.ft(name).create_index(fields=schema, definition=definition)
+        return True
+
+    def rebuild_index(self, vector_dimension, poll_interval: float = 0.5) -> str:
+        """Builds a new index with the current settings and swaps it in online.
+
+        The new index is created under a versioned name over the same key prefix,
+        so existing chunks are indexed in the background while the old index keeps
+        serving. Once indexing finishes, index_name becomes an alias of the new
+        index and the old one is dropped without deleting its documents.
+        """
+
+        current = self.client.ft(self.index_name).info()["index_name"]
+        target = f"{self.index_name}:{self.algorithm.lower()}:{int(time.time())}"
+        self.init_index(vector_dimension, index_name=target)
+
+        while float(self.client.ft(target).info()["percent_indexed"]) < 1:
+            time.sleep(poll_interval)
+
+        pipeline = self.client.pipeline(transaction=True)
+        if current == self.index_name:
+            # First rebuild: the name is a real index and must be freed for the alias.
+            pipeline.execute_command("FT.DROPINDEX", current)
+            pipeline.execute_command("FT.ALIASADD", self.index_name, target)
+        else:
+            pipeline.execute_command("FT.ALIASUPDATE", self.index_name, target)
+            pipeline.execute_command("FT.DROPINDEX", current)
+        pipeline.execute()
+
+        logger.info(f"Index {self.index_name} now points to {target}.")
+        return target
+
+
+class AsyncRedisVectorCache(RedisVectorCache):
+    """RedisVectorCache whose request-path calls go through redis.asyncio.
+
+    find_similar, get_insertables and write await a shared async connection
+    pool instead of blocking the event loop. Index administration (init_index,
+    rebuild_index, migrations) stays on the synchronous client since it only
+    runs at startup or from cache_admin.py.
+    """
+
+    _async_pool = None
+
+    def __init__(self, host, port, **kwargs) -> None:
+        super().__init__(host, port, **kwargs)
+        if AsyncRedisVectorCache._async_pool is None:
+            AsyncRedisVectorCache._async_pool = aioredis.ConnectionPool(
+                host=host, port=port
+            )
+
+        self.aclient = aioredis.Redis(connection_pool=AsyncRedisVectorCache._async_pool)
+
+    async def aclose(self):
+        self.close()
+        if AsyncRedisVectorCache._async_pool is not None:
+            await AsyncRedisVectorCache._async_pool.disconnect()
+            AsyncRedisVectorCache._async_pool = None
+
+    async def run_pipeline(self, commands: list[tuple], transaction=False) -> list:
+        pipeline = self.aclient.pipeline(transaction=transaction)
+        for command in commands:
+            pipeline.execute_command(*command)
+        return await pipeline.execute()
+
+    async def find_similar(
+        self, vector: list[float], k=10, with_vectors: bool = True
+    ) -> list[Document]:
+        fields = ("text", "url", "vector") if with_vectors else ("text", "url")
+        query = self.knn_query(k, *fields)
+        response = await self.aclient.execute_command(
+            "FT.SEARCH", *self.search_args(query, vector)
         )
+        return self.parse_hits(response)
@@ -0,0 +1,126 @@
+from functools import lru_cache
+import re
+from typing import Callable
+
+from models.document import Document
+from retrieval.embeddings import estimate_tokens
+from util import logger
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+WORDS = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str):
+    """Tokenizer for model, loaded once; None if tiktoken is unavailable."""
+
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception as e:
+        logger.info(f"Falling back to estimated token counts: {e!r}")
+        return None
+
+
+def token_counter(model: str, cache_size: int = 8192) -> Callable[[str], int]:
+    """Exact token counts with the model's tokenizer, memoized per text."""
+
+    encoding = get_encoding(model)
+    if encoding is None:
+        return estimate_tokens
+
+    @lru_cache(maxsize=cache_size)
+    def count(text: str) -> int:
+        return len(encoding.encode_ordinary(text))
+
+    return count
+
+
+def overlap(left: str, right: str, min_length: int, max_length: int) -> int:
+    """Length of the longest suffix of left that is also a prefix of right."""
+
+    for length in range(min(len(left), len(right), max_length), min_length - 1, -1):
+        if left.endswith(right[:length]):
+            return length
+    return 0
+
+
+class ContextBuilder:
+    """Packs the most similar documents into a bounded prompt context.
+
+    Documents are taken best first. Text a chunk shares with an already chosen
+    neighbour from the same page (the splitter's chunk_overlap) is trimmed,
+    chunks whose words mostly repeat a chosen one are dropped, and a chunk
+    that would overflow max_tokens is skipped in favour of smaller ones.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 2000,
+        model: str = "gpt-3.5-turbo",
+        separator: str = "\n",
+        duplicate_threshold: float = 0.8,
+        min_overlap: int = 20,
+        max_overlap: int = 200,
+    ) -> None:
+        self.max_tokens = max_tokens
+        self.separator = separator
+        self.duplicate_threshold = duplicate_threshold
+        self.min_overlap = min_overlap
+        self.max_overlap = max_overlap
+        self.count_tokens = token_counter(model)
+
+    def trim(self, text: str, neighbours: list[str]) -> str:
+        for chosen in neighbours:
+            head = overlap(chosen, text, self.min_overlap, self.max_overlap)
+            if head:
+                text = text[head:].lstrip()
+            tail = overlap(text, chosen, self.min_overlap, self.max_overlap)
+            if tail:
+                text = text[:-tail].rstrip()
+        return text
+
+    def is_duplicate(self, words: set[str], chosen: list[set[str]]) -> bool:
+        for other in chosen:
+            union = len(words | other)
+            if union and len(words & other) / union >= self.duplicate_threshold:
+                return True
+        return False
+
+    def build(self, documents: list[Document]) -> str:
+        ranked = sorted(
+            documents,
+            key=lambda doc: doc.similarity if doc.similarity is not None else -1,
+            reverse=True,
+        )
+        texts: list[str] = []
+        chosen_words: list[set[str]] = []
+        by_url: dict[str, list[str]] = {}
+        budget = self.max_tokens
+        separator_tokens = self.count_tokens(self.separator)
+
+        for doc in ranked:
+            text = self.trim(doc.text.strip(), by_url.get(doc.url, []))
+            words = set(WORDS.findall(text.lower()))
+            if not words or self.is_duplicate(words, chosen_words):
+                continue
+
+            tokens = self.count_tokens(text) + (separator_tokens if texts else 0)
+            if tokens > budget:
+                continue
+
+            budget -= tokens
+            texts.append(text)
+            chosen_words.append(words)
+            by_url.setdefault(doc.url, []).append(doc.text.strip())
+
+        logger.info(
+            f"CONTEXT TOKENS: {self.max_tokens - budget} "
+            f"({len(texts)} of {len(documents)} documents)"
+        )
+        return self.separator.join(texts)
@@ -1,8 +1,16 @@
 from abc import ABC, abstractmethod
+import asyncio
+from collections import OrderedDict
+import hashlib
 import json
+from typing import Callable, Optional
 import aiohttp
+import numpy as np
 
 import openai
+import redis.asyncio as aioredis
+from util import logger
+from util.http import client_session
 
 
 class Embeddings(ABC):
@@ -17,12 +25,16 @@ class RemoteEmbeddings(Embeddings):
     """Instanciates a client that implements _embeddings service."""
 
     vector_dimension = 384
+    model = "remote"
+
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None) -> None:
+        self.session = session
 
     async def run(self, chunks: list[str]) -> list[list[float]]:
         url = f"http://embeddings/encode"
         headers = {"Content-Type": "application/json"}
         payload = json.dumps({"text": chunks})
-        async with aiohttp.ClientSession() as session:
+        async with client_session(self.session) as session:
             async with session.post(url, data=payload, headers=headers) as response:
                 if response.status == 200:
                     r = await response.json()
@@ -34,10 +46,171 @@ class OpenAIEmbeddings(Embeddings):
     """OpenAI embeddings client wrapper"""
 
     vector_dimension = 1536
+    model = "text-embedding-ada-002"
+
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None) -> None:
+        self.session = session
 
     async def run(
-        self, chunks: list[str], model="text-embedding-ada-002"
+        self, chunks: list[str], model: Optional[str] = None
     ) -> list[list[float]]:
-        response = await openai.Embedding.acreate(input=chunks, model=model)
+        if self.session is not None:
+            # openai reads its aiohttp session from a context var, set per task.
+            openai.aiosession.set(self.session)
+        response = await openai.Embedding.acreate(
+            input=chunks, model=model or self.model
+        )
         vectors = map(lambda x: x["embedding"], response["data"])  # type: ignore
         return list(vectors)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count, assuming about 4 characters per token."""
+
+    return len(text) // 4 + 1
+
+
+class BatchedEmbeddings(Embeddings):
+    """Splits inputs into bounded sub-batches embedded concurrently.
+
+    Batches hold at most max_batch_size texts and max_batch_tokens estimated
+    tokens, run at most max_concurrency at a time (shared across requests), are
+    retried with exponential backoff and are reassembled in input order.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_batch_size: int = 256,
+        max_batch_tokens: int = 8_000,
+        max_concurrency: int = 4,
+        retries: int = 3,
+        backoff: float = 0.5,
+        length_function: Callable[[str], int] = estimate_tokens,
+    ) -> None:
+        self.embeddings = embeddings
+        self.max_batch_size = max_batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.retries = retries
+        self.backoff = backoff
+        self.length_function = length_function
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.vector_dimension = getattr(embeddings, "vector_dimension", None)
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+
+    def make_batches(self, chunks: list[str]) -> list[list[str]]:
+        batches: list[list[str]] = [[]]
+        tokens = 0
+        for chunk in chunks:
+            length = self.length_function(chunk)
+            batch = batches[-1]
+            if batch and (
+                len(batch) >= self.max_batch_size
+                or tokens + length > self.max_batch_tokens
+            ):
+                batches.append([])
+                tokens = 0
+            batches[-1].append(chunk)
+            tokens += length
+        return [batch for batch in batches if batch]
+
+    async def run_batch(self, batch: list[str]) -> list[list[float]]:
+        for attempt in range(self.retries + 1):
+            try:
+                async with self.semaphore:
+                    vectors = await self.embeddings.run(batch)
+                if len(vectors) != len(batch):
+                    raise ValueError(
+                        f"Expected {len(batch)} embeddings, got {len(vectors)}."
+                    )
+                return vectors
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                logger.info(f"EMBEDDING BATCH RETRY {attempt + 1}: {e}")
+                await asyncio.sleep(self.backoff * 2**attempt)
+        return []
+
+    async def run(self, chunks: list[str]) -> list[list[float]]:
+        batches = self.make_batches(chunks)
+        results = await asyncio.gather(*[self.run_batch(batch) for batch in batches])
+        return [vector for vectors in results for vector in vectors]
+
+
+class CachedEmbeddings(Embeddings):
+    """Content-hash cache in front of another Embeddings client.
+
+    Vectors are keyed on sha256(model, text) and looked up first in an
+    in-process LRU, then in Redis (FLOAT32 blobs with a TTL); only the misses
+    are sent to the wrapped client, in a single call. The LRU holds float32
+    arrays (about 6 KB per ada-002 vector rather than ~48 KB as a list of
+    floats); they become lists only when returned.
+    """
+
+    key_prefix = "emb:"
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        client: Optional[aioredis.Redis] = None,
+        max_size: int = 10_000,
+        ttl: int = 86_400,
+    ) -> None:
+        self.embeddings = embeddings
+        self.client = client
+        self.max_size = max_size
+        self.ttl = ttl
+        self.vector_dimension = getattr(embeddings, "vector_dimension", None)
+        self.model = getattr(embeddings, "model", type(embeddings).__name__)
+        self.lru: OrderedDict[str, np.ndarray] = OrderedDict()
+        self.stats = {"memory_hits": 0, "redis_hits": 0, "misses": 0}
+
+    def key(self, text: str) -> str:
+        digest = hashlib.sha256(f"{self.model}\0{text}".encode("utf-8")).hexdigest()
+        return f"{self.key_prefix}{digest}"
+
+    def remember(self, key: str, vector: np.ndarray):
+        self.lru[key] = vector
+        self.lru.move_to_end(key)
+        if len(self.lru) > self.max_size:
+            self.lru.popitem(last=False)
+
+    async def run(self, chunks: list[str]) -> list[list[float]]:
+        keys = [self.key(chunk) for chunk in chunks]
+        found: dict[str, np.ndarray] = {}
+
+        for key in keys:
+            if key in self.lru:
+                self.lru.move_to_end(key)
+                found[key] = self.lru[key]
+        self.stats["memory_hits"] += len(found)
+
+        pending = list(dict.fromkeys(key for key in keys if key not in found))
+        if pending and self.client is not None:
+            for key, blob in zip(pending, await self.client.mget(pending)):
+                if blob:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[key] = vector
+                    self.remember(key, vector)
+                    self.stats["redis_hits"] += 1
+            pending = [key for key in pending if key not in found]
+
+        if pending:
+            texts = {key: chunk for key, chunk in zip(keys, chunks)}
+            vectors = await self.embeddings.run([texts[key] for key in pending])
+            self.stats["misses"] += len(pending)
+
+            pipeline = self.client.pipeline() if self.client is not None else None
+            for key, vector in zip(pending, vectors):
+                if not vector:
+                    continue
+                array = np.asarray(vector, dtype=np.float32)
+                found[key] = array
+                self.remember(key, array)
+                if pipeline is not None:
+                    pipeline.set(key, array.tobytes(), ex=self.ttl)
+            if pipeline is not None:
+                await pipeline.execute()
+
+        logger.info(f"EMBEDDING CACHE: {self.stats} ({len(self.lru)} in memory)")
+        return [found[key].tolist() if key in found else [] for key in keys]
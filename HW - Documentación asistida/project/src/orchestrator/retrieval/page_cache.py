@@ -0,0 +1,254 @@
+from abc import ABC, abstractmethod
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Optional
+
+import redis.asyncio as aioredis
+from models.page import CachedPage
+from retrieval.scraper import Scraper
+from util import logger
+
+
+def url_key(url: str) -> str:
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+class PageStore(ABC):
+    """Storage for parsed pages, keyed by URL."""
+
+    @abstractmethod
+    async def get(self, url: str) -> Optional[CachedPage]:
+        pass
+
+    @abstractmethod
+    async def set(self, page: CachedPage):
+        pass
+
+
+class DiskPageStore(PageStore):
+    """One JSON file per page, evicting least recently used files past max_bytes.
+
+    Reads and writes run in worker threads, so the size bookkeeping is locked.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 2**20) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.sizes = {
+            entry.path: entry.stat().st_size
+            for entry in sorted(os.scandir(directory), key=lambda e: e.stat().st_atime)
+            if entry.name.endswith(".json")
+        }
+        self.total = sum(self.sizes.values())
+        self.lock = threading.Lock()
+
+    def path(self, url: str) -> str:
+        return os.path.join(self.directory, f"{url_key(url)}.json")
+
+    def read(self, path: str) -> Optional[CachedPage]:
+        try:
+            with open(path, encoding="utf-8") as file:
+                page = CachedPage.model_validate_json(file.read())
+        except (FileNotFoundError, ValueError):
+            return None
+        os.utime(path)
+        size = os.path.getsize(path)
+        with self.lock:
+            # Files written by another process since startup are new to us.
+            self.total += size - self.sizes.pop(path, 0)
+            self.sizes[path] = size
+        return page
+
+    def write(self, page: CachedPage):
+        path = self.path(page.url)
+        data = page.model_dump_json()
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(data)
+        size = len(data.encode("utf-8"))
+        with self.lock:
+            self.total += size - self.sizes.pop(path, 0)
+            self.sizes[path] = size
+            evicted = []
+            while self.total > self.max_bytes and len(self.sizes) > 1:
+                oldest = next(iter(self.sizes))
+                self.total -= self.sizes.pop(oldest)
+                evicted.append(oldest)
+
+        for oldest in evicted:
+            try:
+                os.remove(oldest)
+            except FileNotFoundError:
+                pass
+
+    async def get(self, url: str) -> Optional[CachedPage]:
+        return await asyncio.to_thread(self.read, self.path(url))
+
+    async def set(self, page: CachedPage):
+        await asyncio.to_thread(self.write, page)
+
+
+class RedisPageStore(PageStore):
+    """Pages as JSON strings under page:*, keeping the max_entries most recently used.
+
+    page:* keys expire after ttl on their own; their pages:lru members are
+    dropped once seen missing or older than ttl, so expired pages don't count
+    towards max_entries.
+    """
+
+    key_prefix = "page:"
+    lru_key = "pages:lru"
+
+    def __init__(
+        self, client: aioredis.Redis, max_entries: int = 10_000, ttl: int = 7 * 86_400
+    ) -> None:
+        self.client = client
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+    async def get(self, url: str) -> Optional[CachedPage]:
+        key = f"{self.key_prefix}{url_key(url)}"
+        data = await self.client.get(key)
+        if data is None:
+            await self.client.zrem(self.lru_key, key)
+            return None
+        await self.client.zadd(self.lru_key, {key: time.time()})
+        return CachedPage.model_validate_json(data)
+
+    async def set(self, page: CachedPage):
+        key = f"{self.key_prefix}{url_key(page.url)}"
+        now = time.time()
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.set(key, page.model_dump_json(), ex=self.ttl)
+        pipeline.zadd(self.lru_key, {key: now})
+        # Unused for ttl seconds means written at least that long ago: expired.
+        pipeline.zremrangebyscore(self.lru_key, "-inf", now - self.ttl)
+        pipeline.zcard(self.lru_key)
+        *_, size = await pipeline.execute()
+
+        if size > self.max_entries:
+            evicted = await self.client.zrange(
+                self.lru_key, 0, size - self.max_entries - 1
+            )
+            pipeline = self.client.pipeline(transaction=False)
+            pipeline.delete(*evicted)
+            pipeline.zrem(self.lru_key, *evicted)
+            await pipeline.execute()
+
+
+class CachedScraper(Scraper):
+    """Page-level cache in front of another Scraper.
+
+    Fresh entries (younger than their Cache-Control max-age, or default_max_age)
+    are served without network I/O. Stale entries are revalidated with a
+    conditional GET when the wrapped scraper supports it, and reused on 304.
+    """
+
+    def __init__(
+        self, scraper: Scraper, store: PageStore, default_max_age: float = 3600
+    ) -> None:
+        self.scraper = scraper
+        self.store = store
+        self.default_max_age = default_max_age
+        self.revalidates = getattr(scraper, "supports_revalidation", False)
+        self.stats = {"fresh": 0, "revalidated": 0, "fetched": 0, "stale": 0}
+
+    async def fetch(self, url: str) -> dict[str, Any]:
+        now = time.time()
+        entry = await self.store.get(url)
+        if entry is not None and now - entry.fetched_at < entry.max_age:
+            self.stats["fresh"] += 1
+            return {"url": url, "text": entry.text}
+
+        headers = {}
+        if self.revalidates:
+            if entry is not None and entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry is not None and entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        try:
+            if self.revalidates:
+                page = await self.scraper.fetch(url, headers=headers)  # type: ignore
+            else:
+                page = await self.scraper.fetch(url)
+        except Exception as e:
+            if entry is None:
+                raise
+            # stale-if-error: an outdated copy beats no page at all.
+            self.stats["stale"] += 1
+            logger.info(f"SERVING STALE PAGE: {url} {e!r}")
+            return {"url": url, "text": entry.text}
+
+        max_age = page.get("max_age")
+        if max_age is None:
+            max_age = self.default_max_age
+
+        if page.get("status") == 304 and entry is not None:
+            self.stats["revalidated"] += 1
+            entry.fetched_at = now
+            entry.max_age = max_age
+            await self.store.set(entry)
+            return {"url": url, "text": entry.text}
+
+        status = page.get("status", 200)
+        if status >= 500 and entry is not None:
+            self.stats["stale"] += 1
+            logger.info(f"SERVING STALE PAGE: {url} (status {status})")
+            return {"url": url, "text": entry.text}
+
+        self.stats["fetched"] += 1
+        # Only cache real content: error and challenge pages (404, 429, 503...)
+        # would otherwise be embedded on every query until they expire.
+        if status == 200 and page["text"] and not page.get("no_store"):
+            await self.store.set(
+                CachedPage(
+                    url=url,
+                    text=page["text"],
+                    etag=page.get("etag"),
+                    last_modified=page.get("last_modified"),
+                    fetched_at=now,
+                    max_age=max_age,
+                )
+            )
+        return page
+
+    async def fetch_many(self, urls: list[str]) -> AsyncIterator[dict[str, Any]]:
+        """Serves fresh entries from the store and forwards only the misses to
+        the wrapped scraper in a single batch."""
+
+        if self.revalidates:
+            async for page in super().fetch_many(urls):
+                yield page
+            return
+
+        now = time.time()
+        entries = await asyncio.gather(*(self.store.get(url) for url in urls))
+        misses = []
+        for url, entry in zip(urls, entries):
+            if entry is not None and now - entry.fetched_at < entry.max_age:
+                self.stats["fresh"] += 1
+                yield {"url": url, "text": entry.text}
+            else:
+                misses.append(url)
+
+        if not misses:
+            return
+        pages = self.scraper.fetch_many(misses)
+        try:
+            async for page in pages:
+                self.stats["fetched"] += 1
+                if page.get("status", 200) == 200 and page["text"]:
+                    await self.store.set(
+                        CachedPage(
+                            url=page["url"],
+                            text=page["text"],
+                            fetched_at=now,
+                            max_age=self.default_max_age,
+                        )
+                    )
+                yield page
+        finally:
+            await pages.aclose()  # type: ignore
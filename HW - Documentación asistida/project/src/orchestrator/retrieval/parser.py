@@ -0,0 +1,118 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import re
+from typing import Optional
+
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml.etree
+    import lxml.html
+except ImportError:
+    lxml = None
+
+BOILERPLATE_TAGS = ["script", "style", "noscript", "template", "svg", "nav", "footer"]
+WHITESPACE = re.compile(r"\n{3,}|\s{2,}")
+
+
+def available_backend() -> str:
+    """Fastest installed backend: selectolax, then lxml, then html.parser."""
+
+    if LexborHTMLParser is not None:
+        return "selectolax"
+    if lxml is not None:
+        return "lxml"
+    return "html.parser"
+
+
+def join_strings(strings) -> str:
+    """Mirrors BeautifulSoup.get_text(separator=" ", strip=True) plus cleanup."""
+
+    raw_text = " ".join(s for s in (s.strip() for s in strings) if s)
+    return WHITESPACE.sub("\n", raw_text)
+
+
+def lxml_root(html: str):
+    try:
+        return lxml.html.fromstring(html)
+    except ValueError:
+        # Strings with an XML encoding declaration must be passed as bytes.
+        return lxml.html.fromstring(html.encode("utf-8"))
+
+
+def extract_text(html: str, backend: str = "html.parser") -> str:
+    """Extracts visible text from html, dropping boilerplate tags first.
+
+    Top-level so it can be shipped to a process pool.
+    """
+
+    if not html:
+        return ""
+
+    if backend == "selectolax":
+        tree = LexborHTMLParser(html)
+        tree.strip_tags(BOILERPLATE_TAGS)
+        if tree.root is None:
+            return ""
+        return join_strings(tree.root.text(separator="\x00", strip=True).split("\x00"))
+
+    if backend == "lxml":
+        try:
+            root = lxml_root(html)
+        except lxml.etree.ParserError:
+            # Whitespace- or comment-only documents have no root element.
+            return ""
+        for element in list(root.iter(*BOILERPLATE_TAGS)):
+            element.drop_tree()
+        return join_strings(root.itertext())
+
+    soup = BeautifulSoup(html, backend)
+    for element in soup(BOILERPLATE_TAGS):
+        element.decompose()
+    return join_strings(soup.stripped_strings)
+
+
+class HtmlParser:
+    """Runs text extraction off the event loop in a process pool.
+
+    Pages smaller than inline_below characters are parsed in place, since
+    shipping them to a worker costs more than parsing them.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[str] = None,
+        workers: Optional[int] = None,
+        inline_below: int = 20_000,
+    ) -> None:
+        self.backend = backend or available_backend()
+        self.workers = workers
+        self.inline_below = inline_below
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    async def parse(self, html: str) -> str:
+        if len(html) < self.inline_below:
+            return extract_text(html, self.backend)
+
+        if self.executor is None:
+            # forkserver children don't inherit the event loop, sockets or
+            # locks held by other threads at fork time.
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, extract_text, html, self.backend
+        )
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
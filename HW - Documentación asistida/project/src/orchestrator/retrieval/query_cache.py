@@ -0,0 +1,120 @@
+import hashlib
+from typing import AsyncGenerator, Optional
+
+import numpy as np
+import redis.asyncio as aioredis
+from redis.commands.search.field import TextField, VectorField
+from redis.commands.search.indexDefinition import IndexDefinition, IndexType
+from redis.exceptions import ResponseError
+from models.query import CachedQuery
+from util import logger
+
+
+class QueryCache:
+    """Semantic cache of whole answers, keyed on the query embedding.
+
+    Each entry holds the search results, the final context and, when answers
+    is set, the LLM answer for one query. A new query whose cosine similarity
+    to a stored one reaches threshold reuses that entry's context, skipping
+    the search and scrape stages; the stored answer is only replayed from
+    answer_threshold up, since ada-002 scores rephrasings that change the
+    question's meaning well above 0.95. Entries expire after ttl seconds so
+    answers to time-sensitive questions do not go stale.
+    """
+
+    key_prefix = "queries:"
+    index_name = "idx:queries"
+
+    def __init__(
+        self,
+        client: aioredis.Redis,
+        threshold: float = 0.98,
+        answer_threshold: float = 0.99,
+        ttl: int = 3600,
+        answers: bool = True,
+    ) -> None:
+        self.client = client
+        self.threshold = threshold
+        self.answer_threshold = answer_threshold
+        self.ttl = ttl
+        self.answers = answers
+        self.stats = {"hits": 0, "misses": 0}
+
+    async def init_index(self, vector_dimension: int):
+        schema = (
+            TextField("query", no_stem=True),
+            VectorField(
+                "vector",
+                "FLAT",
+                {
+                    "TYPE": "FLOAT32",
+                    "DIM": vector_dimension,
+                    "DISTANCE_METRIC": "COSINE",
+                },
+            ),
+        )
+        definition = IndexDefinition(
+            prefix=[self.key_prefix], index_type=IndexType.HASH
+        )
+        try:
+            await self.client.ft(self.index_name).create_index(
+                fields=schema, definition=definition
+            )
+        except ResponseError:
+            logger.info("Query index already exists.")
+
+    async def lookup(self, vector: list[float]) -> Optional[CachedQuery]:
+        blob = np.asarray(vector, dtype=np.float32).tobytes()
+        response = await self.client.execute_command(
+            "FT.SEARCH",
+            self.index_name,
+            "(*)=>[KNN 1 @vector $query_vector AS vector_score]",
+            "RETURN", 5, "vector_score", "query", "search", "context", "answer",
+            "PARAMS", 2, "query_vector", blob,
+            "DIALECT", 2,
+        )  # fmt: skip
+        for fields in response[2::2]:
+            hit = {
+                key.decode("utf-8"): value.decode("utf-8")
+                for key, value in zip(fields[::2], fields[1::2])
+            }
+            similarity = 1 - float(hit.pop("vector_score"))
+            if similarity >= self.threshold:
+                self.stats["hits"] += 1
+                if similarity < self.answer_threshold:
+                    hit.pop("answer", None)
+                logger.info(f"QUERY CACHE HIT: {hit['query']!r} ({similarity:.3f})")
+                return CachedQuery(similarity=similarity, **hit)
+        self.stats["misses"] += 1
+        return None
+
+    async def store(
+        self,
+        query: str,
+        vector: list[float],
+        search: str,
+        context: str,
+        answer: Optional[str] = None,
+    ):
+        digest = hashlib.sha256(query.strip().lower().encode("utf-8")).hexdigest()
+        key = f"{self.key_prefix}{digest}"
+        mapping = {
+            "query": query,
+            "search": search,
+            "context": context,
+            "vector": np.asarray(vector, dtype=np.float32).tobytes(),
+        }
+        if self.answers and answer:
+            mapping["answer"] = answer
+
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.delete(key)
+        pipeline.hset(key, mapping=mapping)
+        pipeline.expire(key, self.ttl)
+        await pipeline.execute()
+
+    async def events(self, entry: CachedQuery) -> AsyncGenerator[dict, None]:
+        """Replays the Retriever.get_context events the entry stands in for."""
+
+        yield {"event": "search", "data": entry.search}
+        yield {"event": "context", "data": entry.context}
@@ -0,0 +1,92 @@
+import numpy as np
+from models.document import Document
+
+
+class Ranker:
+    """Ranks candidate chunks against a query vector by cosine similarity.
+
+    Candidate vectors are kept in float32 matrices and scored with a single
+    normalized matrix-vector product per batch; the top-k is picked with a
+    partial selection instead of a full sort. Batches are stored as they come
+    and joined only when top_k needs the vectors, and scores go to a buffer
+    that doubles when full, so adding pages one by one copies linearly.
+    """
+
+    def __init__(self, query_vector: list[float]) -> None:
+        query = np.asarray(query_vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        self.query = query / norm if norm else query
+        self.texts: list[str] = []
+        self.urls: list[str] = []
+        self.blocks = [np.empty((0, query.shape[0]), dtype=np.float32)]
+        self.buffer = np.empty(64, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    @property
+    def scores(self) -> np.ndarray:
+        return self.buffer[: len(self.texts)]
+
+    @property
+    def matrix(self) -> np.ndarray:
+        if len(self.blocks) > 1:
+            self.blocks = [np.concatenate(self.blocks)]
+        return self.blocks[0]
+
+    def add(self, documents: list[dict]) -> np.ndarray:
+        """Scores a batch of {text, url, vector} dicts and adds them to the pool."""
+
+        if not documents:
+            return np.empty(0, dtype=np.float32)
+
+        matrix = np.array([doc["vector"] for doc in documents], dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1)
+        scores = matrix @ self.query
+        np.divide(scores, norms, out=scores, where=norms > 0)
+
+        start, end = len(self.texts), len(self.texts) + len(documents)
+        if end > len(self.buffer):
+            buffer = np.empty(max(end, 2 * len(self.buffer)), dtype=np.float32)
+            buffer[:start] = self.scores
+            self.buffer = buffer
+        self.buffer[start:end] = scores
+
+        self.texts.extend(doc["text"] for doc in documents)
+        self.urls.extend(doc["url"] for doc in documents)
+        self.blocks.append(matrix)
+        return scores
+
+    def top_indices(self, k: int) -> np.ndarray:
+        """Indices of the k best scored candidates, best first."""
+
+        k = min(k, len(self.scores))
+        if k <= 0:
+            return np.empty(0, dtype=np.intp)
+
+        if k < len(self.scores):
+            indices = np.argpartition(-self.scores, k - 1)[:k]
+        else:
+            indices = np.arange(len(self.scores))
+        return indices[np.argsort(-self.scores[indices], kind="stable")]
+
+    def kth_score(self, k: int) -> float:
+        """Similarity of the kth best candidate, -inf while there are fewer."""
+
+        if k <= 0 or k > len(self.scores):
+            return float("-inf")
+        return float(np.partition(self.scores, len(self.scores) - k)[-k])
+
+    def top_k(self, k: int) -> list[Document]:
+        """Builds Document objects for the k most similar candidates."""
+
+        matrix, scores = self.matrix, self.scores
+        return [
+            Document(
+                text=self.texts[i],
+                url=self.urls[i],
+                vector=matrix[i].tolist(),
+                similarity=float(scores[i]),
+            )
+            for i in self.top_indices(k)
+        ]
@@ -0,0 +1,93 @@
+"""Native port of langchain's RecursiveCharacterTextSplitter for len lengths.
+
+Standard library only: the scraper service's image copies this file in as
+splitter.py, so its pre-split chunks come from the same code as ours.
+"""
+
+from bisect import bisect_left, bisect_right
+from itertools import accumulate, repeat
+from operator import add, sub
+
+SEPARATORS = ["\n\n", "\n", " ", ""]
+
+
+def split_text(
+    text: str, chunk_size: int, chunk_overlap: int, separators: list[str] = SEPARATORS
+) -> list[str]:
+    """Same output as RecursiveCharacterTextSplitter(separators, keep_separator=True,
+    length_function=len), without its per-level regex scans and string copies.
+
+    Each level checks for its separator with a substring test and splits once
+    with str.split. Since the kept separators make the splits tile the text
+    exactly, they are handled as offsets into it: chunks are sliced straight
+    out of the text, and packing jumps between chunk boundaries with bisect
+    instead of visiting every split.
+    """
+
+    separator, remaining = separators[-1], []
+    for i, candidate in enumerate(separators):
+        if candidate == "" or candidate in text:
+            separator, remaining = candidate, separators[i + 1 :]
+            break
+
+    if separator:
+        # Split i spans bounds[i]:bounds[i + 1] and, past the first, starts
+        # with the separator.
+        width = len(separator)
+        lengths = list(map(len, text.split(separator)))
+        ends = accumulate(map(add, lengths, repeat(width)))
+        bounds = [0, *map(sub, ends, repeat(width))]
+        candidates = [i for i, n in enumerate(lengths) if n + width >= chunk_size]
+    else:
+        bounds = list(range(len(text) + 1))
+        candidates = list(range(len(text))) if chunk_size <= 1 else []
+
+    chunks: list[str] = []
+    first = 0  # first split of the current run of short splits
+    for i in candidates:
+        if bounds[i + 1] - bounds[i] < chunk_size:
+            continue
+        if first < i:
+            merge_splits(text, bounds, first, i, chunk_size, chunk_overlap, chunks)
+        split = text[bounds[i] : bounds[i + 1]]
+        if remaining:
+            chunks.extend(split_text(split, chunk_size, chunk_overlap, remaining))
+        else:
+            chunks.append(split)
+        first = i + 1
+    if first < len(bounds) - 1:
+        merge_splits(
+            text, bounds, first, len(bounds) - 1, chunk_size, chunk_overlap, chunks
+        )
+    return chunks
+
+
+def merge_splits(
+    text: str,
+    bounds: list[int],
+    first: int,
+    last: int,
+    chunk_size: int,
+    chunk_overlap: int,
+    chunks: list[str],
+):
+    """Greedily packs splits first..last-1 (all shorter than chunk_size) into
+    chunks, carrying up to chunk_overlap characters into the next one."""
+
+    start = first  # first split of the chunk being built
+    while True:
+        # The first split that no longer fits closes the chunk.
+        end = bisect_right(bounds, bounds[start] + chunk_size, start + 1, last + 1)
+        if end > last:
+            break
+        i = end - 1
+        chunk = text[bounds[start] : bounds[i]].strip()
+        if chunk:
+            chunks.append(chunk)
+        # Drop leading splits until at most chunk_overlap characters are
+        # carried over and split i fits after them.
+        keep_from = max(bounds[i] - chunk_overlap, bounds[i + 1] - chunk_size)
+        start = bisect_left(bounds, keep_from, start, i)
+    chunk = text[bounds[start] : bounds[last]].strip()
+    if chunk:
+        chunks.append(chunk)
@@ -1,17 +1,17 @@
 import asyncio
 import json
 import time
-from typing import Any, AsyncGenerator
-import numpy as np
-import pandas as pd
+from typing import AsyncGenerator, Optional
 from util import logger
+from util.metrics import observe, span
 from models.document import Document
 from retrieval.search import Searcher
 from retrieval.cache import VectorDbCache
 from retrieval.splitter import Splitter
 from retrieval.scraper import Scraper
 from retrieval.embeddings import Embeddings
-from sklearn.metrics.pairwise import cosine_similarity
+from retrieval.ranking import Ranker
+from retrieval.context import ContextBuilder
 from models.search import SearchDoc, SearchResult
 
 
@@ -23,20 +23,32 @@ class Retriever:
         scraper: Scraper,
         embeddings: Embeddings,
         splitter: Splitter,
+        pipelined: bool = False,
+        deadline: Optional[float] = None,
+        early_exit: Optional[float] = None,
+        context_builder: Optional[ContextBuilder] = None,
     ) -> None:
         self.cache = cache
         self.searcher = searcher
         self.scraper = scraper
         self.embeddings = embeddings
         self.splitter = splitter
+        self.pipelined = pipelined
+        self.deadline = deadline
+        self.early_exit = early_exit
+        self.context_builder = context_builder
 
     async def get_context(
         self, query: str, cache_treshold: float = 0.85, k: int = 10
     ) -> AsyncGenerator[dict, None]:
         """Generates context based on query. It can retrieve from cache or from internet."""
 
-        query_vector = await self.embeddings.run([query])
-        documents = await self.cache.find_similar(query_vector[0], k)
+        with span("embed_query"):
+            query_vector = await self.embeddings.run([query])
+        with span("cache_knn"):
+            documents = await self.cache.find_similar(
+                query_vector[0], k, with_vectors=False
+            )
         quality_cache = await self.evaluate_retrieval(documents, cache_treshold)
 
         logger.info(f"QUALITY CACHE: {quality_cache}")
@@ -46,15 +58,21 @@ class Retriever:
                 items=[SearchDoc(link=doc.url) for doc in documents]
             )
         else:
-            search_results = await self.searcher.run(query)
+            with span("search"):
+                search_results = await self.searcher.run(query)
 
         yield {"event": "search", "data": json.dumps(search_results.model_dump())}
 
         if not quality_cache:
             documents = await self.search_for_documents(search_results, query_vector, k)
-            await self.cache.write(documents)
-
-        context = "\n".join([doc.text for doc in documents])
+            with span("cache_write"):
+                await self.cache.write(documents)
+
+        with span("context"):
+            if self.context_builder is not None:
+                context = self.context_builder.build(documents)
+            else:
+                context = "\n".join([doc.text for doc in documents])
         yield {"event": "context", "data": context}
 
     async def search_for_documents(
@@ -62,25 +80,33 @@ class Retriever:
     ) -> list[Document]:
         """Searches for relevant information on the internet."""
 
+        if self.pipelined:
+            return await self.search_for_documents_pipelined(
+                search_results, query_vector, k
+            )
+
         start = time.perf_counter()
 
         results = search_results.model_dump()
-        tasks = [self.scraper.fetch(item["link"]) for item in results["items"]]
+        tasks = [self.scraper.fetch_safe(item["link"]) for item in results["items"]]
         pages = await asyncio.gather(*tasks)
 
         end = time.perf_counter()
         logger.info(f"SCRAPE TIME: {end - start}")
 
+        pages = [page for page in pages if page["text"]]
+        unsplit = [page for page in pages if not page.get("chunks")]
+        with span("split"):
+            splits = await self.splitter.split_many([page["text"] for page in unsplit])
+        for page, chunks in zip(unsplit, splits):
+            page["chunks"] = chunks
+
         documents = []
-        page_count = 0
         for page in pages:
-            if page["text"]:
-                page_count += 1
-                splits = await self.splitter.split(page["text"])
-                for split in splits:
-                    documents.append({"text": split, "url": page["url"]})
+            for split in page["chunks"]:
+                documents.append({"text": split, "url": page["url"]})
 
-        logger.info(f"SCRAPED PAGES: {page_count}")
+        logger.info(f"SCRAPED PAGES: {len(pages)}")
         logger.info(f"SPLIT COUNT: {len(documents)}")
 
         embedding_start_time = time.perf_counter()
@@ -91,31 +117,117 @@ class Retriever:
             documents[i]["vector"] = vector
 
         embedding_time = time.perf_counter() - embedding_start_time
+        observe("embed", embedding_time)
         logger.info(f"EMBEDDING TIME: {embedding_time}")
 
-        relevant_documents = await self.get_most_similar(query_vector, documents, k)
+        with span("rank"):
+            relevant_documents = await self.get_most_similar(query_vector, documents, k)
         mean_score = await self.get_mean_similarity(relevant_documents)
 
         logger.info(f"RETRIEVAL SCORE: {mean_score}")
         return relevant_documents
 
-    async def get_most_similar(self, query_vector, data, k=5) -> list[Document]:
-        """Get most relevant texts based on cosine similarity"""
+    async def search_for_documents_pipelined(
+        self, search_results, query_vector, k
+    ) -> list[Document]:
+        """Splits, embeds and ranks every page as soon as it is scraped.
 
-        query_vector = np.array(query_vector).reshape(1, -1)
+        A slow URL no longer holds up the others. If a deadline is set, whatever
+        has been embedded by then is ranked and the remaining work is cancelled.
+        With early_exit set, the same happens as soon as the kth best similarity
+        reaches it, since further pages can no longer lift the top-k floor much.
+        """
 
-        def compute_cosine_similarity(row):
-            return cosine_similarity(query_vector, row)[0][0]
+        start = time.perf_counter()
+        ranker = Ranker(query_vector)
+        counts = {"pages": 0, "splits": 0}
+        enough = asyncio.Event()
+
+        async def embed(page):
+            splits = page.get("chunks")
+            if not splits:
+                with span("split"):
+                    splits = await self.splitter.split(page["text"])
+            counts["splits"] += len(splits)
+            if not splits:
+                return
+
+            embedding_start_time = time.perf_counter()
+            vectors = await self.embeddings.run(splits)
+            embedding_end_time = time.perf_counter()
+            observe("embed", embedding_end_time - embedding_start_time)
+            logger.info(
+                f"EMBEDDING TIME: {embedding_end_time - embedding_start_time} "
+                f"({len(splits)} splits from {page['url']}, "
+                f"{embedding_start_time - start:.2f}s -> {embedding_end_time - start:.2f}s)"
+            )
+            with span("rank"):
+                ranker.add(
+                    [
+                        {"text": split, "url": page["url"], "vector": vector}
+                        for split, vector in zip(splits, vectors)
+                        if vector
+                    ]
+                )
+            if self.early_exit is not None and ranker.kth_score(k) >= self.early_exit:
+                enough.set()
+
+        embeds: list[asyncio.Task] = []
+
+        async def scrape_and_embed():
+            pages = self.scraper.fetch_many(
+                [item.link for item in search_results.items]
+            )
+            try:
+                async for page in pages:
+                    logger.info(
+                        f"SCRAPE TIME: {time.perf_counter() - start} ({page['url']})"
+                    )
+                    if page["text"]:
+                        counts["pages"] += 1
+                        embeds.append(asyncio.create_task(embed(page)))
+            finally:
+                await pages.aclose()  # type: ignore
+            for result in await asyncio.gather(*embeds, return_exceptions=True):
+                if isinstance(result, Exception):
+                    logger.info(f"EMBEDDING FAILED: {result!r}")
+
+        work = asyncio.create_task(scrape_and_embed())
+        stop = asyncio.create_task(enough.wait())
+        try:
+            done, _ = await asyncio.wait(
+                {work, stop}, timeout=self.deadline, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                logger.info(f"DEADLINE REACHED: ranking {len(ranker)} embedded splits")
+            elif work in done:
+                work.result()
+            else:
+                logger.info(
+                    f"EARLY EXIT: top-{k} floor {ranker.kth_score(k):.3f} after "
+                    f"{counts['pages']} pages in {time.perf_counter() - start:.2f}s"
+                )
+        finally:
+            for task in [work, stop, *embeds]:
+                task.cancel()
+            await asyncio.gather(work, stop, return_exceptions=True)
+
+        logger.info(f"SCRAPED PAGES: {counts['pages']}")
+        logger.info(f"SPLIT COUNT: {counts['splits']}")
+
+        with span("rank"):
+            relevant_documents = ranker.top_k(k)
+        mean_score = await self.get_mean_similarity(relevant_documents)
 
-        df: Any = pd.DataFrame(data)
-        df["vector"] = df["vector"].apply(lambda x: np.array(x).reshape(1, -1))
-        df["similarity"] = df["vector"].apply(compute_cosine_similarity)
-        similar = df.nlargest(k, "similarity")[["text", "url", "vector", "similarity"]]
-        similar["vector"] = similar["vector"].apply(lambda x: x[0].tolist())
+        logger.info(f"RETRIEVAL SCORE: {mean_score}")
+        return relevant_documents
 
-        json_docs = similar.to_dict("records")
+    async def get_most_similar(self, query_vector, data, k=5) -> list[Document]:
+        """Get most relevant texts based on cosine similarity"""
 
-        return [Document(**json_doc) for json_doc in json_docs]
+        ranker = Ranker(query_vector)
+        ranker.add(data)
+        return ranker.top_k(k)
 
     async def evaluate_retrieval(
         self, documents: list[Document], treshold: float
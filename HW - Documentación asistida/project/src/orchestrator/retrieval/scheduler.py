@@ -0,0 +1,175 @@
+import asyncio
+from collections import deque
+import time
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+import numpy as np
+from retrieval.scraper import Scraper
+
+
+class TokenBucket:
+    """Allows rate requests per second on average, with bursts up to burst."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+            self.tokens = 0
+            self.updated = time.monotonic()
+
+    def full(self) -> bool:
+        """True if nobody is waiting and the bucket has refilled to burst."""
+
+        if self.lock.locked():
+            return False
+        elapsed = time.monotonic() - self.updated
+        return self.tokens + elapsed * self.rate >= self.capacity
+
+
+class ScheduledScraper(Scraper):
+    """Rate-limited, hedged fetching in front of another Scraper.
+
+    Fetches are capped globally at max_concurrency and per host at per_domain,
+    and each host gets a token bucket of rate requests per second. A fetch
+    still running after the p95 of recent fetch latencies (hedge_after until
+    enough samples exist) gets a duplicate request, and whichever answers
+    first wins. Connection reuse per host comes from the shared session's
+    keep-alive pool. A host's limits are dropped once it is idle with a full
+    bucket, since a fresh semaphore and bucket behave the same; more than
+    max_hosts tracked hosts triggers a sweep for any that became so later.
+    """
+
+    def __init__(
+        self,
+        scraper: Scraper,
+        max_concurrency: int = 16,
+        per_domain: int = 2,
+        rate: float = 4.0,
+        burst: int = 4,
+        hedge: bool = True,
+        hedge_after: float = 1.0,
+        min_samples: int = 20,
+        window: int = 200,
+        max_hosts: int = 1024,
+    ) -> None:
+        self.scraper = scraper
+        self.supports_revalidation = getattr(scraper, "supports_revalidation", False)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.per_domain = per_domain
+        self.rate = rate
+        self.burst = burst
+        self.max_hosts = max_hosts
+        self.domains: dict[str, asyncio.Semaphore] = {}
+        self.buckets: dict[str, TokenBucket] = {}
+        self.users: dict[str, int] = {}
+        self.hedge = hedge
+        self.hedge_after = hedge_after
+        self.min_samples = min_samples
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.stats = {"fetched": 0, "hedged": 0, "hedge_wins": 0}
+
+    def hedge_delay(self) -> Optional[float]:
+        if not self.hedge:
+            return None
+        if len(self.latencies) < self.min_samples:
+            return self.hedge_after
+        return float(np.percentile(self.latencies, 95))
+
+    def join(self, domain: str):
+        if domain not in self.users:
+            if len(self.users) >= self.max_hosts:
+                self.evict_idle()
+            self.domains[domain] = asyncio.Semaphore(self.per_domain)
+            self.buckets[domain] = TokenBucket(self.rate, self.burst)
+            self.users[domain] = 0
+        self.users[domain] += 1
+
+    def leave(self, domain: str):
+        self.users[domain] -= 1
+        if self.users[domain] == 0 and self.buckets[domain].full():
+            self.forget(domain)
+
+    def forget(self, domain: str):
+        del self.domains[domain], self.buckets[domain], self.users[domain]
+
+    def evict_idle(self):
+        idle = [
+            domain
+            for domain, users in self.users.items()
+            if users == 0 and self.buckets[domain].full()
+        ]
+        for domain in idle:
+            self.forget(domain)
+
+    async def fetch_limited(
+        self, url: str, started: asyncio.Event, **kwargs
+    ) -> dict[str, Any]:
+        domain = urlsplit(url).hostname or ""
+        self.join(domain)
+        try:
+            async with self.domains[domain]:
+                await self.buckets[domain].acquire()
+                async with self.semaphore:
+                    started.set()
+                    start = time.perf_counter()
+                    page = await self.scraper.fetch(url, **kwargs)
+                    self.latencies.append(time.perf_counter() - start)
+                    return page
+        finally:
+            self.leave(domain)
+
+    async def fetch(self, url: str, **kwargs) -> dict[str, Any]:
+        self.stats["fetched"] += 1
+        started = asyncio.Event()
+        primary = asyncio.create_task(self.fetch_limited(url, started, **kwargs))
+        tasks = {primary}
+        try:
+            delay = self.hedge_delay()
+            if delay is not None:
+                # The hedge clock starts once the primary holds its slots, so
+                # time spent queueing behind the limits never triggers a hedge.
+                waiter = asyncio.create_task(started.wait())
+                await asyncio.wait(
+                    {primary, waiter}, return_when=asyncio.FIRST_COMPLETED
+                )
+                waiter.cancel()
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    self.stats["hedged"] += 1
+                    tasks.add(
+                        asyncio.create_task(
+                            self.fetch_limited(url, asyncio.Event(), **kwargs)
+                        )
+                    )
+
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    error = task.exception()
+                    if error is None:
+                        if task is not primary:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+            assert error is not None
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
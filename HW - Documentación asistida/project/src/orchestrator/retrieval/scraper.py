@@ -1,19 +1,68 @@
 from abc import ABC, abstractmethod
+import asyncio
+import json
 import re
-from typing import Any
+import time
+from typing import Any, AsyncIterator, Optional
 
 import aiohttp
 from bs4 import BeautifulSoup
+from retrieval.parser import HtmlParser
+from util import logger
+from util.http import client_session
+from util.metrics import observe, span
+
+
+def cache_headers(headers) -> dict[str, Any]:
+    """Validators and freshness information from an HTTP response."""
+
+    cache_control = headers.get("Cache-Control", "").lower()
+    match = re.search(r"max-age=(\d+)", cache_control)
+    max_age = None
+    if "no-cache" in cache_control:
+        max_age = 0
+    elif match:
+        max_age = int(match[1])
+
+    return {
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "max_age": max_age,
+        "no_store": "no-store" in cache_control,
+    }
 
 
 class Scraper(ABC):
+    parser: Optional[HtmlParser] = None
+
     @abstractmethod
     async def fetch(self, url: str) -> dict[str, Any]:
         pass
 
+    async def fetch_safe(self, url: str) -> dict[str, Any]:
+        try:
+            return await self.fetch(url)
+        except Exception as e:
+            logger.info(f"SCRAPE FAILED: {url} {e!r}")
+            return {"url": url, "text": None}
+
+    async def fetch_many(self, urls: list[str]) -> AsyncIterator[dict[str, Any]]:
+        """Fetches urls concurrently, yielding pages as they complete."""
+
+        tasks = [asyncio.create_task(self.fetch_safe(url)) for url in urls]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
     async def parse(self, body):
         """Parses all the text from the html."""
 
+        if self.parser is not None:
+            return await self.parser.parse(body)
+
         soup = BeautifulSoup(body, "html.parser")
         raw_text = soup.get_text(separator=" ", strip=True)
         text = re.sub(r"\n{3,}|\s{2,}", "\n", raw_text)
@@ -21,28 +70,115 @@ class Scraper(ABC):
 
 
 class ScraperRemote(Scraper):
-    def __init__(self, host: str = "http://lb-scraper/scrape/?url=") -> None:
+    def __init__(
+        self,
+        host: str = "http://lb-scraper/scrape/?url=",
+        session: Optional[aiohttp.ClientSession] = None,
+        parser: Optional[HtmlParser] = None,
+        batch_url: str = "http://lb-scraper/scrape/batch",
+        output: str = "text",
+        chunk_size: int = 400,
+        chunk_overlap: int = 50,
+    ) -> None:
+        """output="text" has the service extract text, so no html crosses the
+        network or gets parsed here; "chunks" also has it pre-split, which must
+        match the Retriever's splitter settings; "html" parses locally."""
+
         self.host = host
+        self.session = session
+        self.parser = parser
+        self.batch_url = batch_url
+        self.options = {
+            "output": output,
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+        }
 
     async def fetch(self, url: str) -> dict[str, Any]:
-        async with aiohttp.ClientSession() as session:
+        async with client_session(self.session) as session:
             query_url = self.host + url
-            async with session.post(query_url) as response:
-                if response.status == 200:
+            with span("scrape"):
+                async with session.post(query_url, params=self.options) as response:
+                    if response.status != 200:
+                        return {"url": url, "text": None}
                     body = await response.json()
-                    text = await self.parse(body["html"])
-                    if text:
-                        return {"url": url, "text": text}
-            return {"url": url, "text": None}
+            return await self.to_page(url, body)
+
+    async def to_page(self, url: str, body: dict[str, Any]) -> dict[str, Any]:
+        """Builds a page from a service response in any output format."""
+
+        if body.get("chunks"):
+            chunks = body["chunks"]
+            return {"url": url, "text": "\n".join(chunks), "chunks": chunks}
+        if "text" in body:
+            return {"url": url, "text": body["text"] or None}
+        text = await self.parse(body["html"]) if body.get("html") else None
+        return {"url": url, "text": text or None}
+
+    async def fetch_many(self, urls: list[str]) -> AsyncIterator[dict[str, Any]]:
+        """Scrapes all urls in one /scrape/batch round trip, yielding NDJSON
+        results as the service finishes each page.
+
+        Per-page times aren't known here, so the round trip is recorded once
+        as the scrape_batch stage.
+        """
+
+        start = time.perf_counter()
+        pending = set(urls)
+        try:
+            async with client_session(self.session) as session:
+                async with session.post(
+                    self.batch_url, json={"urls": urls, **self.options}
+                ) as response:
+                    if response.status != 200:
+                        logger.info(f"BATCH SCRAPE FAILED: status {response.status}")
+                    else:
+                        buffer = bytearray()
+                        async for chunk in response.content.iter_any():
+                            buffer.extend(chunk)
+                            *lines, rest = buffer.split(b"\n")
+                            buffer = bytearray(rest)
+                            for line in lines:
+                                if line.strip():
+                                    page = await self.parse_batch_line(line)
+                                    pending.discard(page["url"])
+                                    yield page
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Keep the pages already yielded; the rest just come back empty.
+            logger.info(f"BATCH SCRAPE FAILED: {len(pending)} pages left, {e!r}")
+        observe("scrape_batch", time.perf_counter() - start)
+
+        for url in urls:
+            if url in pending:
+                yield {"url": url, "text": None}
+
+    async def parse_batch_line(self, line: bytes) -> dict[str, Any]:
+        item = json.loads(line)
+        return await self.to_page(item["url"], item)
 
 
 class ScraperLocal(Scraper):
-    async def fetch(self, url):
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                url, timeout=aiohttp.ClientTimeout(total=5)
-            ) as response:
-                html = await response.text()
-                text = await self.parse(html)
-
-                return {"url": url, "text": text}
+    supports_revalidation = True
+
+    def __init__(
+        self,
+        session: Optional[aiohttp.ClientSession] = None,
+        parser: Optional[HtmlParser] = None,
+    ) -> None:
+        self.session = session
+        self.parser = parser
+
+    async def fetch(self, url, headers: Optional[dict[str, str]] = None):
+        async with client_session(self.session) as session:
+            with span("scrape"):
+                async with session.get(
+                    url, headers=headers, timeout=aiohttp.ClientTimeout(total=5)
+                ) as response:
+                    validators = cache_headers(response.headers)
+                    if response.status == 304:
+                        return {"url": url, "text": None, "status": 304, **validators}
+                    status = response.status
+                    html = await response.text()
+
+            text = await self.parse(html)
+            return {"url": url, "text": text, "status": status, **validators}
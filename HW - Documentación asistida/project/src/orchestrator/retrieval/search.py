@@ -1,7 +1,9 @@
 from abc import ABC, abstractmethod
 import os
+from typing import Optional
 from urllib.parse import urlencode
 from models.search import SearchResult
+from util.http import client_session
 import aiohttp
 
 from mocks.test_dict import provisional_search_result
@@ -25,8 +27,9 @@ class Searcher(ABC):
 
 
 class GoogleAPI(Searcher):
-    def __init__(self) -> None:
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None) -> None:
         super().__init__()
+        self.session = session
 
     async def run(self, query: str) -> SearchResult:
         query_params = urlencode(
@@ -39,7 +42,7 @@ class GoogleAPI(Searcher):
         )
         url = f"{GOOGLE_API_URL}{query_params}"
 
-        async with aiohttp.ClientSession() as session:
+        async with client_session(self.session) as session:
             async with session.get(
                 url,
                 headers=REQUEST_HEADERS,
@@ -1,7 +1,14 @@
 from abc import ABC, abstractmethod
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import multiprocessing
+import os
+from typing import Optional
 import numpy as np
 import spacy
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from retrieval.recursive_splitter import SEPARATORS, split_text
 
 
 class Splitter(ABC):
@@ -9,66 +16,171 @@ class Splitter(ABC):
     async def split(self, text: str) -> list[str]:
         pass
 
+    async def split_many(self, texts: list[str]) -> list[list[str]]:
+        return [await self.split(text) for text in texts]
+
+
+def split_batch(texts: list[str], chunk_size: int, chunk_overlap: int):
+    return [split_text(text, chunk_size, chunk_overlap) for text in texts]
+
 
 class LangChainSplitter(Splitter):
-    def __init__(self, chunk_size, chunk_overlap, length_function) -> None:
+    """RecursiveCharacterTextSplitter chunking.
+
+    With length_function=len the native split_text engine is used; it gives
+    identical chunks several times faster. Other length functions go through
+    one RecursiveCharacterTextSplitter built up front. split_many ships large
+    batches to a process pool, since splitting is pure Python and holds the GIL.
+    """
+
+    def __init__(
+        self,
+        chunk_size,
+        chunk_overlap,
+        length_function,
+        workers: Optional[int] = None,
+        inline_below: int = 500_000,
+    ) -> None:
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.length_function = length_function
-
-    async def split(self, text: str) -> list[str]:
-        text_splitter = RecursiveCharacterTextSplitter(
-            # Set a really small chunk size, just to show.
-            separators=["\n\n", "\n", " ", ""],
+        self.native = length_function is len
+        self.text_splitter = RecursiveCharacterTextSplitter(
+            separators=SEPARATORS,
             chunk_size=self.chunk_size,
             chunk_overlap=self.chunk_overlap,
             length_function=self.length_function,
             # is_separator_regex=False,
         )
-        chunks = text_splitter.split_text(text)
+        self.workers = workers or os.cpu_count() or 1
+        self.inline_below = inline_below
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+    def split_text(self, text: str) -> list[str]:
+        if self.native:
+            return split_text(text, self.chunk_size, self.chunk_overlap)
+        return self.text_splitter.split_text(text)
 
+    async def split(self, text: str) -> list[str]:
+        return self.split_text(text)
+
+    async def split_many(self, texts: list[str]) -> list[list[str]]:
+        if not self.native or sum(len(text) for text in texts) < self.inline_below:
+            return [self.split_text(text) for text in texts]
+
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("forkserver"),
+            )
+        loop = asyncio.get_running_loop()
+        batches = [texts[i :: self.workers] for i in range(self.workers)]
+        results = await asyncio.gather(
+            *[
+                loop.run_in_executor(
+                    self.executor,
+                    split_batch,
+                    batch,
+                    self.chunk_size,
+                    self.chunk_overlap,
+                )
+                for batch in batches
+                if batch
+            ]
+        )
+        # Undo the round-robin batching so results line up with texts.
+        chunks: list[list[str]] = [[] for _ in texts]
+        for i, result in enumerate(results):
+            chunks[i :: self.workers] = result
         return chunks
 
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
 
-nlp = spacy.load("en_core_web_sm")
+
+# Sentence boundaries come from the parser and sentence vectors from the
+# tok2vec tensor; nothing else in the pipeline is used.
+DISABLED_COMPONENTS = ["tagger", "attribute_ruler", "lemmatizer", "ner"]
+
+
+@lru_cache(maxsize=None)
+def load_nlp(model: str = "en_core_web_sm"):
+    """Loads the spaCy model on first use instead of at import time."""
+
+    return spacy.load(model, disable=DISABLED_COMPONENTS)
+
+
+def sentence_vectors(sents) -> np.ndarray:
+    if not sents:
+        return np.empty((0, 0), dtype=np.float32)
+    vecs = np.stack([sent.vector for sent in sents])
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    return np.divide(vecs, norms, out=np.zeros_like(vecs), where=norms > 0)
 
 
 class AdjSenSplitter(Splitter):
-    def __init__(self) -> None:
-        pass
+    """Groups adjacent sentences with similar vectors into chunks.
 
-    async def process(self, text):
-        # Load the Spacy model
-        doc = nlp(text)
-        sents = list(doc.sents)
-        vecs = np.stack([sent.vector / sent.vector_norm for sent in sents])  # type: ignore
+    Pages are parsed in one nlp.pipe batch (n_process > 1 fans it out over
+    worker processes) in a thread, off the event loop. Clusters that come out
+    too long are re-clustered from the sentence vectors of the first pass
+    rather than parsing their text again.
+    """
+
+    def __init__(self, n_process: int = 1, batch_size: int = 16) -> None:
+        self.n_process = n_process
+        self.batch_size = batch_size
 
-        return sents, vecs
+    def process_many(self, texts: list[str]) -> list[tuple[list[str], np.ndarray]]:
+        """Sentence texts and unit sentence vectors for each text."""
 
-    async def cluster_text(self, sents, vecs, threshold):
-        clusters = [[0]]
-        for i in range(1, len(sents)):
-            if np.dot(vecs[i], vecs[i - 1]) < threshold:
-                clusters.append([])
-            clusters[-1].append(i)
+        docs = load_nlp().pipe(
+            texts, n_process=self.n_process, batch_size=self.batch_size
+        )
+        results = []
+        for doc in docs:
+            sents = list(doc.sents)
+            results.append(([sent.text for sent in sents], sentence_vectors(sents)))
+        return results
 
-        return clusters
+    async def process(self, text):
+        return (await asyncio.to_thread(self.process_many, [text]))[0]
+
+    def cluster_text(self, vecs: np.ndarray, threshold: float) -> np.ndarray:
+        """(start, end) ranges of adjacent sentences, broken wherever the
+        similarity of a sentence to the previous one drops below threshold."""
+
+        similarities = np.einsum("ij,ij->i", vecs[1:], vecs[:-1])
+        breaks = np.flatnonzero(similarities < threshold) + 1
+        bounds = np.concatenate(([0], breaks, [len(vecs)]))
+        return np.column_stack((bounds[:-1], bounds[1:]))
 
     async def split(self, text: str, similarity_treshold: float = 0.6):
-        # Initialize the clusters lengths list and final texts list
-        clusters_lens = []
-        final_texts = []
+        return (await self.split_many([text], similarity_treshold))[0]
 
-        # Process the chunk
-        threshold = 0.5
-        sents, vecs = await self.process(text)
+    async def split_many(
+        self, texts: list[str], similarity_treshold: float = 0.6
+    ) -> list[list[str]]:
+        processed = await asyncio.to_thread(self.process_many, texts)
+        return [
+            await self.split_processed(sents, vecs, similarity_treshold)
+            for sents, vecs in processed
+        ]
 
-        # Cluster the sentences
-        clusters = await self.cluster_text(sents, vecs, threshold)
+    async def split_processed(self, sents, vecs, similarity_treshold: float):
+        final_texts: list[str] = []
+        if not sents:
+            return final_texts
+
+        # Length of " ".join(sents[start:end]) is offsets[end] - offsets[start] - 1
+        offsets = np.concatenate(([0], np.cumsum([len(sent) + 1 for sent in sents])))
 
-        for cluster in clusters:
-            cluster_txt = " ".join([sents[i].text for i in cluster])
-            cluster_len = len(cluster_txt)
+        # Cluster the sentences
+        threshold = 0.5
+        for start, end in self.cluster_text(vecs, threshold).tolist():
+            cluster_len = offsets[end] - offsets[start] - 1
 
             # Check if the cluster is too short
             if cluster_len < 60:
@@ -76,22 +188,14 @@ class AdjSenSplitter(Splitter):
 
             # Check if the cluster is too long
             elif cluster_len > 3000:
-                threshold = similarity_treshold
-                sents_div, vecs_div = await self.process(cluster_txt)
-                reclusters = await self.cluster_text(sents_div, vecs_div, threshold)
-
-                for subcluster in reclusters:
-                    div_txt = " ".join([sents_div[i].text for i in subcluster])
-                    div_len = len(div_txt)
-
+                reclusters = self.cluster_text(vecs[start:end], similarity_treshold)
+                for div_start, div_end in (reclusters + start).tolist():
+                    div_len = offsets[div_end] - offsets[div_start] - 1
                     if div_len < 60 or div_len > 3000:
                         continue
-
-                    clusters_lens.append(div_len)
-                    final_texts.append(div_txt)
+                    final_texts.append(" ".join(sents[div_start:div_end]))
 
             else:
-                clusters_lens.append(cluster_len)
-                final_texts.append(cluster_txt)
+                final_texts.append(" ".join(sents[start:end]))
 
         return final_texts
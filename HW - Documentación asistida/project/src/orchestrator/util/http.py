@@ -0,0 +1,30 @@
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+import aiohttp
+
+
+def create_session(
+    limit: int = 100, limit_per_host: int = 10, keepalive_timeout: float = 30
+) -> aiohttp.ClientSession:
+    """Pooled keep-alive session meant to be shared by every outbound client."""
+
+    connector = aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=limit_per_host,
+        keepalive_timeout=keepalive_timeout,
+        ttl_dns_cache=300,
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+
+@asynccontextmanager
+async def client_session(
+    session: Optional[aiohttp.ClientSession],
+) -> AsyncIterator[aiohttp.ClientSession]:
+    """Yields the shared session, or a throwaway one when none was injected."""
+
+    if session is not None:
+        yield session
+    else:
+        async with aiohttp.ClientSession() as session:
+            yield session
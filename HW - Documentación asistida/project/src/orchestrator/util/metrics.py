@@ -0,0 +1,130 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+from typing import Iterator, Optional
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+RATE_BUCKETS = (1, 5, 10, 20, 40, 60, 80, 100, 150, 200)
+
+
+class Histogram:
+    """Cumulative-bucket histogram, one series per label value.
+
+    observe() is a bisect and two additions, cheap enough for the hot path.
+    """
+
+    def __init__(self, name: str, help: str, label: str, buckets: tuple) -> None:
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = buckets
+        self.series: dict[str, list] = {}
+
+    def observe(self, label: str, value: float):
+        series = self.series.get(label)
+        if series is None:
+            series = self.series[label] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for label, (counts, total) in sorted(self.series.items()):
+            tag = f'{self.label}="{label}"'
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{tag},le="{bound}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{tag}}} {total}")
+            lines.append(f"{self.name}_count{{{tag}}} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "orchestrator_stage_seconds",
+    "Latency of each request stage.",
+    "stage",
+    LATENCY_BUCKETS,
+)
+LLM_TOKENS_PER_SECOND = Histogram(
+    "orchestrator_llm_tokens_per_second",
+    "Completion streaming rate after the first token.",
+    "model",
+    RATE_BUCKETS,
+)
+
+
+STATS: dict[str, dict[str, int]] = {}
+
+
+def register_stats(component: str, stats: dict[str, int]):
+    """Exports a component's stats dict as counters; it is read at render time."""
+
+    STATS[component] = stats
+
+
+def render_stats() -> list[str]:
+    name = "orchestrator_events_total"
+    lines = [
+        f"# HELP {name} Cache, scheduling and other component event counts.",
+        f"# TYPE {name} counter",
+    ]
+    for component, stats in sorted(STATS.items()):
+        for event, count in sorted(stats.items()):
+            lines.append(f'{name}{{component="{component}",event="{event}"}} {count}')
+    return lines
+
+
+class Trace:
+    """Per-request record of stage durations, for the SSE timing summary."""
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.stages: dict[str, list[float]] = {}
+
+    def add(self, stage: str, seconds: float):
+        self.stages.setdefault(stage, []).append(seconds)
+
+    def summary(self) -> dict:
+        return {
+            "total": time.perf_counter() - self.start,
+            "stages": {
+                stage: {"count": len(values), "seconds": sum(values)}
+                for stage, values in self.stages.items()
+            },
+        }
+
+
+current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+def start_trace() -> Trace:
+    """Starts a trace for the current request; tasks spawned afterwards share it."""
+
+    trace = Trace()
+    current_trace.set(trace)
+    return trace
+
+
+def observe(stage: str, seconds: float):
+    STAGE_SECONDS.observe(stage, seconds)
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+
+    lines = STAGE_SECONDS.render() + LLM_TOKENS_PER_SECOND.render() + render_stats()
+    return "\n".join(lines) + "\n"
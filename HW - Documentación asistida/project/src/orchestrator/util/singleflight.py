@@ -0,0 +1,118 @@
+import asyncio
+from itertools import count
+from typing import AsyncGenerator, AsyncIterator, Callable, Optional
+from util import logger
+
+
+class Flight:
+    """One in-progress event stream, replayed to every subscriber.
+
+    Events are kept for the flight's lifetime so a late subscriber still sees
+    the search and context events it needs before the tokens. The producer
+    runs at most max_ahead events ahead of its slowest subscriber, so upstream
+    (e.g. the chat completion) is still only pulled as fast as clients read.
+    """
+
+    def __init__(self, max_ahead: int = 64) -> None:
+        self.events: list[dict] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.updated = asyncio.Event()
+        self.consumed = asyncio.Event()
+        self.positions: dict[int, int] = {}
+        self.ids = count()
+        self.max_ahead = max_ahead
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self.positions)
+
+    def notify(self):
+        self.updated.set()
+        self.updated = asyncio.Event()
+
+    def lag(self) -> int:
+        return len(self.events) - min(self.positions.values(), default=0)
+
+    async def run(self, source: AsyncIterator[dict]):
+        try:
+            async for event in source:
+                self.events.append(event)
+                self.notify()
+                while self.lag() >= self.max_ahead:
+                    await self.consumed.wait()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = True
+            self.notify()
+            await source.aclose()  # type: ignore
+
+    def advance(self, subscriber: int, seen: int):
+        self.positions[subscriber] = seen
+        self.consumed.set()
+        self.consumed = asyncio.Event()
+
+    def leave(self, subscriber: int):
+        del self.positions[subscriber]
+        self.consumed.set()
+        self.consumed = asyncio.Event()
+
+    async def subscribe(self) -> AsyncGenerator[dict, None]:
+        subscriber = next(self.ids)
+        self.positions[subscriber] = 0
+        seen = 0
+        try:
+            while True:
+                while seen < len(self.events):
+                    yield self.events[seen]
+                    seen += 1
+                    self.advance(subscriber, seen)
+                if self.finished:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await self.updated.wait()
+        finally:
+            self.leave(subscriber)
+
+
+class SingleFlight:
+    """Coalesces concurrent requests for the same key into one upstream stream.
+
+    The first caller starts the stream in a background task; callers arriving
+    while it runs subscribe to it instead of starting their own. The stream is
+    cancelled once every subscriber has gone, like a lone client disconnecting.
+    """
+
+    def __init__(self, max_ahead: int = 64) -> None:
+        self.flights: dict[str, Flight] = {}
+        self.max_ahead = max_ahead
+
+    async def stream(
+        self, key: str, source: Callable[[], AsyncIterator[dict]]
+    ) -> AsyncGenerator[dict, None]:
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = self.flights[key] = Flight(self.max_ahead)
+            flight.task = asyncio.create_task(flight.run(source()))
+            flight.task.add_done_callback(lambda _: self.forget(key, flight))
+        else:
+            logger.info(f"COALESCED REQUEST: {key!r}")
+
+        events = flight.subscribe()
+        try:
+            async for event in events:
+                yield event
+        finally:
+            await events.aclose()
+            if flight.subscribers == 0 and flight.task is not None:
+                # Forget first so a request arriving now starts a new flight
+                # instead of joining the one being cancelled.
+                self.forget(key, flight)
+                flight.task.cancel()
+
+    def forget(self, key: str, flight: Flight):
+        if self.flights.get(key) is flight:
+            del self.flights[key]
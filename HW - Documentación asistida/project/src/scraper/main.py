@@ -1,50 +1,421 @@
+import asyncio
+import gzip
+import json
+import os
+import re
 import time
-from fastapi import FastAPI, HTTPException
-from playwright.async_api import async_playwright
+import zlib
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from playwright.async_api import (
+    Browser,
+    BrowserContext,
+    Playwright,
+    Route,
+    async_playwright,
+)
+from pydantic import BaseModel
 from playwright._impl._api_types import TimeoutError
-from contextlib import asynccontextmanager
+from selectolax.lexbor import LexborHTMLParser
+from contextlib import asynccontextmanager, suppress
+from typing import Literal, Optional
 import logging
 import aiohttp
+from splitter import split_text
 
 logger = logging.getLogger(__name__)
-app = FastAPI()
 
+BROWSERS = int(os.environ.get("SCRAPER_BROWSERS", 2))
+MAX_PAGES = int(os.environ.get("SCRAPER_MAX_PAGES", 8))
+MAX_BROWSER_USES = int(os.environ.get("SCRAPER_MAX_BROWSER_USES", 500))
+BLOCKED_RESOURCES = {"image", "font", "media"}
+MIN_TEXT_CHARS = 500
+MIN_TEXT_DENSITY = 0.05
 
-async def fetch_check_js(url):
-    async with aiohttp.ClientSession() as session:
+INVISIBLE = re.compile(r"<(script|style|noscript|template)\b.*?</\1\s*>", re.I | re.S)
+TAGS = re.compile(r"<[^>]+>")
+NOSCRIPT_WARNING = re.compile(
+    r"<noscript\b[^>]*>[^<]*(enable|requires?|turn on)[^<]*javascript", re.I
+)
+FRAMEWORK_ROOTS = re.compile(
+    r'id="(root|app|__next|__nuxt)"|data-reactroot|ng-version=|window\.__NUXT__', re.I
+)
+
+# Same extraction as the orchestrator's retrieval.parser, so "text" output
+# matches what it would have parsed from the html.
+BOILERPLATE_TAGS = ["script", "style", "noscript", "template", "svg", "nav", "footer"]
+WHITESPACE = re.compile(r"\n{3,}|\s{2,}")
+MIN_GZIP_BYTES = 1000
+# Keeps the lb-scraper nginx from buffering NDJSON batch results.
+STREAM_HEADERS = {"X-Accel-Buffering": "no"}
+Mode = Literal["tiered", "browser"]
+
+# Runs inside the rendered page, so only the text crosses the CDP connection.
+EXTRACT_TEXT_JS = """(tags) => {
+    document.querySelectorAll(tags.join(",")).forEach((element) => element.remove());
+    const walker = document.createTreeWalker(document.documentElement, NodeFilter.SHOW_TEXT);
+    const strings = [];
+    while (walker.nextNode()) {
+        const text = walker.currentNode.nodeValue.trim();
+        if (text) strings.push(text);
+    }
+    return strings.join(" ");
+}"""
+
+
+async def fetch_check_js(url, session: aiohttp.ClientSession) -> Optional[str]:
+    """Plain HTTP fetch; None when the response is not usable HTML."""
+
+    try:
         async with session.get(url, timeout=aiohttp.ClientTimeout(total=3)) as response:
-            html = await response.text()
+            if response.status != 200 or "html" not in response.content_type:
+                return None
+            return await response.text()
+    except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeDecodeError):
+        return None
 
-            # if not "text/javascript" in html:
-            return html
-    return None
 
+def needs_rendering(html: str) -> bool:
+    """Guesses whether a statically fetched page only fills in with JavaScript."""
 
-@asynccontextmanager
-async def launch_browser():
-    async with async_playwright() as p:
-        browser = await p.firefox.launch(headless=True)
+    text = " ".join(TAGS.sub(" ", INVISIBLE.sub(" ", html)).split())
+    if len(text) < MIN_TEXT_CHARS:
+        return True
+    density = len(text) / len(html)
+    if FRAMEWORK_ROOTS.search(html) and density < MIN_TEXT_DENSITY:
+        return True
+    return bool(NOSCRIPT_WARNING.search(html)) and len(text) < 4 * MIN_TEXT_CHARS
+
+
+def extract_text(html: str) -> str:
+    tree = LexborHTMLParser(html)
+    tree.strip_tags(BOILERPLATE_TAGS)
+    if tree.root is None:
+        return ""
+    strings = tree.root.text(separator="\x00", strip=True).split("\x00")
+    return WHITESPACE.sub("\n", " ".join(s for s in (s.strip() for s in strings) if s))
+
+
+def shape(page: dict, output: str, chunk_size: int, chunk_overlap: int) -> dict:
+    """Replaces a scraped page's html with the requested output format.
+
+    CPU-bound on big pages; call it in a worker thread.
+    """
+
+    if output == "html" or page.get("html") is None:
+        return page
+    text = page.pop("text", None)
+    html = page.pop("html")
+    if text is None:
+        text = extract_text(html)
+    if output == "chunks":
+        page["chunks"] = split_text(text, chunk_size, chunk_overlap)
+    else:
+        page["text"] = text
+    return page
+
+
+def accepts_gzip(request: Request) -> bool:
+    return "gzip" in request.headers.get("accept-encoding", "")
+
+
+def compressed_json(request: Request, content: dict) -> Response:
+    body = json.dumps(content).encode()
+    if len(body) < MIN_GZIP_BYTES or not accepts_gzip(request):
+        return Response(body, media_type="application/json")
+    return Response(
+        gzip.compress(body, compresslevel=6),
+        media_type="application/json",
+        headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"},
+    )
+
+
+async def block_heavy_resources(route: Route):
+    if route.request.resource_type in BLOCKED_RESOURCES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class BrowserPool:
+    """Long-lived browsers that lease a fresh context and page per request.
+
+    At most max_pages pages are open at once. A browser that crashed, or that
+    served max_uses contexts and is idle, is relaunched on the next lease.
+    """
+
+    def __init__(
+        self, playwright: Playwright, size: int, max_pages: int, max_uses: int
+    ) -> None:
+        self.playwright = playwright
+        self.size = size
+        self.max_uses = max_uses
+        self.browsers: list[Optional[Browser]] = [None] * size
+        self.uses = [0] * size
+        self.active = [0] * size
+        self.semaphore = asyncio.Semaphore(max_pages)
+        self.lock = asyncio.Lock()
+
+    async def start(self):
+        for slot in range(self.size):
+            await self.launch(slot)
+
+    async def launch(self, slot: int):
+        browser = self.browsers[slot]
+        if browser is not None:
+            with suppress(Exception):
+                await browser.close()
+        self.browsers[slot] = await self.playwright.firefox.launch(headless=True)
+        self.uses[slot] = 0
+
+    def healthy(self, slot: int) -> bool:
+        browser = self.browsers[slot]
+        if browser is None or not browser.is_connected():
+            return False
+        return self.uses[slot] < self.max_uses or self.active[slot] > 0
+
+    async def lease(self) -> int:
+        """Slot of the least busy browser, recycled first if needed."""
+
+        async with self.lock:
+            slot = min(range(self.size), key=lambda i: self.active[i])
+            if not self.healthy(slot):
+                logger.info(f"Recycling browser {slot}")
+                await self.launch(slot)
+            self.uses[slot] += 1
+            self.active[slot] += 1
+            return slot
+
+    @asynccontextmanager
+    async def context(self):
+        slot = await self.lease()
+        context = None
         try:
-            yield browser
+            browser = self.browsers[slot]
+            assert browser is not None
+            try:
+                context = await browser.new_context()
+            except Exception:
+                self.uses[slot] = self.max_uses  # recycle once idle
+                raise
+            await context.route("**/*", block_heavy_resources)
+            yield context
         finally:
-            await browser.close()
+            self.active[slot] -= 1
+            if context is not None:
+                with suppress(Exception):
+                    await context.close()
+
+    @asynccontextmanager
+    async def page(self, context: Optional[BrowserContext] = None):
+        """Leases a page, in a fresh context unless a shared one is given."""
+
+        async with self.semaphore:
+            if context is None:
+                async with self.context() as context:
+                    yield await context.new_page()
+                return
+
+            page = await context.new_page()
+            try:
+                yield page
+            finally:
+                with suppress(Exception):
+                    await page.close()
+
+    def status(self) -> dict:
+        return {
+            "browsers": [
+                {
+                    "connected": browser is not None and browser.is_connected(),
+                    "uses": uses,
+                    "active": active,
+                }
+                for browser, uses, active in zip(self.browsers, self.uses, self.active)
+            ]
+        }
 
+    async def close(self):
+        for browser in self.browsers:
+            if browser is not None:
+                with suppress(Exception):
+                    await browser.close()
 
-async def scrape_with_browser(url: str):
-    async with launch_browser() as browser:
-        page = await browser.new_page()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.session = aiohttp.ClientSession()
+    app.state.tiers = {
+        tier: {"count": 0, "seconds": 0.0}
+        for tier in ("static", "escalated", "browser")
+    }
+    playwright = await async_playwright().start()
+    app.state.pool = BrowserPool(
+        playwright, size=BROWSERS, max_pages=MAX_PAGES, max_uses=MAX_BROWSER_USES
+    )
+    await app.state.pool.start()
+    try:
+        yield
+    finally:
+        await app.state.pool.close()
+        await playwright.stop()
+        await app.state.session.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+async def scrape_with_browser(
+    pool: BrowserPool,
+    url: str,
+    context: Optional[BrowserContext] = None,
+    output: str = "html",
+) -> dict:
+    async with pool.page(context) as page:
         await page.goto(url, timeout=2000)
-        html = await page.content()
-    return html
+        if output == "html":
+            return {"html": await page.content()}
+        text = await page.evaluate(EXTRACT_TEXT_JS, BOILERPLATE_TAGS)
+        return {"html": "", "text": WHITESPACE.sub("\n", text)}
+
+
+def record_tier(state, tier: str, start: float):
+    stats = state.tiers[tier]
+    stats["count"] += 1
+    stats["seconds"] += time.perf_counter() - start
+
+
+async def scrape(
+    state,
+    url: str,
+    mode: Mode,
+    context: Optional[BrowserContext] = None,
+    output: str = "html",
+) -> dict:
+    """Scrapes a page, rendering it in a browser only when it seems necessary.
+
+    mode="tiered" tries a plain HTTP fetch first and escalates to Playwright
+    when needs_rendering() says so; mode="browser" always renders. Unless
+    output="html", rendered pages have their text extracted in the browser.
+    Static attempts that end up escalated are recorded as the "escalated"
+    tier, so /stats shows what the static tier costs on pages it can't serve.
+    """
+
+    if mode == "tiered":
+        start = time.perf_counter()
+        html = await fetch_check_js(url, state.session)
+        if html is not None and not needs_rendering(html):
+            record_tier(state, "static", start)
+            return {"url": url, "html": html, "tier": "static"}
+        record_tier(state, "escalated", start)
+
+    start = time.perf_counter()
+    try:
+        page = await scrape_with_browser(state.pool, url, context, output)
+    finally:
+        record_tier(state, "browser", start)
+    return {"url": url, **page, "tier": "browser"}
 
 
 @app.post("/scrape")
-async def scrape_url(url: str):
+async def scrape_url(
+    url: str,
+    request: Request,
+    mode: Mode = "tiered",
+    output: str = "html",
+    chunk_size: int = 400,
+    chunk_overlap: int = 50,
+):
+    """Scrapes one page. output is "html", "text" (extracted main text) or
+    "chunks" (text pre-split into chunk_size/chunk_overlap pieces); responses
+    of any output are gzipped when the client accepts it."""
+
     try:
-        html = await scrape_with_browser(url)
+        page = await scrape(request.app.state, url, mode, output=output)
     except TimeoutError:
         raise HTTPException(status_code=408, detail="Not fast enough")
-    return {"html": html}
+    page = await asyncio.to_thread(shape, page, output, chunk_size, chunk_overlap)
+    del page["url"]
+    return compressed_json(request, page)
+
+
+class BatchRequest(BaseModel):
+    urls: list[str]
+    mode: Mode = "tiered"
+    output: str = "html"
+    chunk_size: int = 400
+    chunk_overlap: int = 50
+
+
+@app.post("/scrape/batch")
+async def scrape_batch(batch: BatchRequest, request: Request):
+    """Scrapes urls concurrently and streams one NDJSON line per finished page.
+
+    Rendered pages share one browser context for the whole batch.
+    """
+
+    state = request.app.state
+
+    async def scrape_one(url: str, context: BrowserContext) -> dict:
+        try:
+            page = await scrape(state, url, batch.mode, context, batch.output)
+            return await asyncio.to_thread(
+                shape, page, batch.output, batch.chunk_size, batch.chunk_overlap
+            )
+        except TimeoutError:
+            return {"url": url, "html": None, "error": "timeout"}
+        except Exception as e:
+            return {"url": url, "html": None, "error": repr(e)}
+
+    async def results():
+        async with state.pool.context() as context:
+            tasks = [
+                asyncio.create_task(scrape_one(url, context)) for url in batch.urls
+            ]
+            try:
+                for task in asyncio.as_completed(tasks):
+                    yield json.dumps(await task) + "\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    if not accepts_gzip(request):
+        return StreamingResponse(
+            results(), media_type="application/x-ndjson", headers=STREAM_HEADERS
+        )
+
+    async def compressed():
+        # Sync-flush after every line so the client can decode pages as they
+        # arrive instead of waiting for the compressor's buffer to fill.
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        async for line in results():
+            yield compressor.compress(line.encode()) + compressor.flush(
+                zlib.Z_SYNC_FLUSH
+            )
+        yield compressor.flush()
+
+    return StreamingResponse(
+        compressed(),
+        media_type="application/x-ndjson",
+        headers={
+            **STREAM_HEADERS,
+            "Content-Encoding": "gzip",
+            "Vary": "Accept-Encoding",
+        },
+    )
+
+
+@app.get("/health")
+async def health(request: Request):
+    return request.app.state.pool.status()
+
+
+@app.get("/stats")
+async def stats(request: Request):
+    return {
+        tier: {**stats, "mean_seconds": stats["seconds"] / max(stats["count"], 1)}
+        for tier, stats in request.app.state.tiers.items()
+    }
 
 
 if __name__ == "__main__":
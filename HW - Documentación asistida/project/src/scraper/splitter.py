@@ -0,0 +1 @@
+../orchestrator/retrieval/recursive_splitter.py
\ No newline at end of file
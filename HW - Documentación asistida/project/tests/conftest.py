@@ -0,0 +1,20 @@
+import os
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parent.parent / "src"
+
+# The orchestrator imports its modules relative to its own directory.
+sys.path.insert(0, str(SRC / "orchestrator"))
+
+# Importing the retrieval package reads the search settings; no test calls the
+# search API, so placeholders are enough outside docker-compose.
+for name in (
+    "GOOGLE_API_HOST",
+    "GOOGLE_API_KEY",
+    "GOOGLE_CX",
+    "GOOGLE_FIELDS",
+    "HEADER_ACCEPT_ENCODING",
+    "HEADER_USER_AGENT",
+):
+    os.environ.setdefault(name, "")
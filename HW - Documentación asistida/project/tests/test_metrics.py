@@ -0,0 +1,49 @@
+import asyncio
+
+from util import metrics
+from util.metrics import Histogram
+from util.singleflight import SingleFlight
+
+
+def test_histogram_render_is_cumulative():
+    histogram = Histogram("test_seconds", "Test latency.", "stage", (0.1, 1))
+    for value in (0.05, 0.1, 0.5, 2, 3):
+        histogram.observe("scrape", value)
+
+    assert histogram.render() == [
+        "# HELP test_seconds Test latency.",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{stage="scrape",le="0.1"} 2',
+        'test_seconds_bucket{stage="scrape",le="1"} 3',
+        'test_seconds_bucket{stage="scrape",le="+Inf"} 5',
+        'test_seconds_sum{stage="scrape"} 5.65',
+        'test_seconds_count{stage="scrape"} 5',
+    ]
+
+
+def test_trace_follows_the_flight_that_starts_it():
+    flights = SingleFlight()
+
+    async def source():
+        metrics.observe("search", 0.5)
+        yield {"event": "search", "data": ""}
+        await asyncio.sleep(0.01)
+        metrics.observe("llm", 1.0)
+        yield {"event": "token", "data": "hi"}
+
+    async def request():
+        trace = metrics.start_trace()
+        events = [event async for event in flights.stream("query", source)]
+        return trace, events
+
+    async def main():
+        return await asyncio.gather(request(), request())
+
+    (first, first_events), (second, second_events) = asyncio.run(main())
+    assert first_events == second_events
+    assert first.summary()["stages"] == {
+        "search": {"count": 1, "seconds": 0.5},
+        "llm": {"count": 1, "seconds": 1.0},
+    }
+    # The coalesced request did no work of its own.
+    assert second.summary()["stages"] == {}
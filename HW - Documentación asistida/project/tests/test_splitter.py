@@ -0,0 +1,55 @@
+import asyncio
+from pathlib import Path
+import random
+
+import pytest
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from retrieval import recursive_splitter
+from retrieval import splitter as orchestrator_splitter
+
+SEPARATORS = ["\n\n", "\n", " ", ""]
+WORDS = ["a", "the", "retrieval", "context", "x" * 450, " ", "\n", "\n\n", "  "]
+SETTINGS = [(400, 50), (100, 0), (50, 49)]
+
+
+def random_texts(seed: int, count: int = 200) -> list[str]:
+    rng = random.Random(seed)
+    texts = ["", " ", "\n\n", "a" * 1000]
+    for _ in range(count):
+        texts.append("".join(rng.choices(WORDS, k=rng.randint(1, 400))))
+    return texts
+
+
+def langchain_split(text: str, chunk_size: int, chunk_overlap: int) -> list[str]:
+    return RecursiveCharacterTextSplitter(
+        separators=SEPARATORS,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+    ).split_text(text)
+
+
+@pytest.mark.parametrize("chunk_size,chunk_overlap", SETTINGS)
+def test_split_text_matches_langchain(chunk_size, chunk_overlap):
+    for text in random_texts(chunk_size):
+        expected = langchain_split(text, chunk_size, chunk_overlap)
+        chunks = recursive_splitter.split_text(text, chunk_size, chunk_overlap)
+        assert chunks == expected
+
+
+def test_scraper_uses_the_orchestrator_splitter():
+    scraper_splitter = Path(__file__).parent.parent / "src/scraper/splitter.py"
+    assert scraper_splitter.resolve() == Path(recursive_splitter.__file__).resolve()
+
+
+def test_split_many_pool_matches_langchain():
+    texts = random_texts(0, count=50)
+    splitter = orchestrator_splitter.LangChainSplitter(
+        400, 50, len, workers=2, inline_below=0
+    )
+    try:
+        chunks = asyncio.run(splitter.split_many(texts))
+    finally:
+        splitter.close()
+    assert chunks == [langchain_split(text, 400, 50) for text in texts]